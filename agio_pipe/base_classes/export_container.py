@@ -7,6 +7,7 @@ from typing import Any
 
 from agio.tools.json_serializer import to_simple_dict
 from agio.core.entities import task as task_, product as product_
+from agio_pipe.utils.entity_cache import register_entity
 
 
 class ExportContainerBase(ABC):
@@ -164,6 +165,7 @@ class ExportContainerBase(ABC):
     def __dump_dict(self):
         product = self.get_product()
         task = self.get_task()
+        product_type = register_entity(product.type)
 
         return dict(
             id=self.id,
@@ -174,8 +176,8 @@ class ExportContainerBase(ABC):
             # optional fields
             options=self.get_options(),
             # extra fields
-            product_type=product.type.name,
-            product_type_id=product.type.id,
+            product_type=product_type.name,
+            product_type_id=product_type.id,
             product_name=product.name,
             variant=product.variant,
             task_name=task.name
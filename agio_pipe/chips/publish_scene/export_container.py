@@ -4,6 +4,7 @@ from uuid import uuid4
 from agio.core.entities.product import AProduct
 from agio.core.entities.task import ATask
 from agio_pipe.base_classes.export_container import ExportContainerBase
+from agio_pipe.utils.entity_cache import get_entity
 
 
 class ExportContainer(ExportContainerBase):
@@ -25,7 +26,7 @@ class ExportContainer(ExportContainerBase):
                 ('product', 'product_id', AProduct),
             ):
             if field not in self.scene_object and id_field in self.scene_object:
-                self.scene_object[field] = cls(self.scene_object[id_field])
+                self.scene_object[field] = get_entity(cls, self.scene_object[id_field])
 
     @property
     def name(self):
@@ -61,7 +62,7 @@ class ExportContainer(ExportContainerBase):
         if 'product' in self.scene_object:
             return self.scene_object['product']
         elif 'product_id' not in self.scene_object:
-            product = AProduct(self.scene_object['id'])
+            product = get_entity(AProduct, self.scene_object['id'])
             self.scene_object['product'] = product
             return product
         else:
@@ -77,7 +78,7 @@ class ExportContainer(ExportContainerBase):
         if not 'task' in self.scene_object:
             if not 'task_id' in self.scene_object:
                 return None
-            self.scene_object['task'] = ATask(self.scene_object['task_id'])
+            self.scene_object['task'] = get_entity(ATask, self.scene_object['task_id'])
         return self.scene_object.get('task')
 
     def set_options(self, options: dict):
@@ -13,5 +13,13 @@ class NoInstancesToPublishError(PublishError):
     detail = 'No instances to publish'
 
 
+class NoChangesError(NoInstancesToPublishError):
+    detail = 'Sources of all instances are not changed'
+
+
 class InstanceDuplicateError(PublishError):
     detail = 'Instance duplicate error'
+
+
+class DependencyCycleError(PublishError):
+    detail = 'Instance dependencies have a cycle'
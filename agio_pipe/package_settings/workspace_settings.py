@@ -35,6 +35,16 @@ class WebPublisherSettings(BaseModel):
     products: list[WebProductSettings] = Field(default_factory=list)
 
 
+class SessionRetentionSettings(BaseModel):
+    enabled: bool = True
+    max_age_days: float = 30
+    failed_max_age_days: float = 90
+    max_count: int = 500
+    max_total_mb: float = 2048
+    # automatic cleanup after publishing runs not often than this
+    auto_cleanup_interval_minutes: float = 60
+
+
 class PipeWorkspaceSettings(APackageSettings):
     # plugins and chips
     publish_plugin: str = PluginSelectField('publish_engine')
@@ -46,6 +56,21 @@ class PipeWorkspaceSettings(APackageSettings):
     publish_templates: Optional[list[PublishTemplate]] = ListField(default=list)
     publication_name_template: str = '{publication_entity.parent.name}_{publication_entity.name}_v{publication_version}'
     align_product_versions: AlignVersions = AlignVersions.NONE
+    # concurrent requests for product versions registration
+    version_registration_workers: int = 4
+    # concurrent instances processing in engines (respecting instance dependencies)
+    publish_workers: int = 4
+    # published files are registered by chunks, failed chunk is retried
+    published_files_chunk_size: int = 200
+    published_files_retries: int = 2
+    # concurrent chunk requests of all versions registered at the same time
+    published_files_workers: int = 4
+    # instances with source files, scene file and options not changed since the last publish are skipped,
+    # instances with sources that are not files (e.g. scene objects) are always published
+    skip_unchanged_instances: bool = False
+    # compare source files by content hash, by size and mtime only otherwise
+    fingerprint_content_hash: bool = False
+    session_retention: SessionRetentionSettings = SessionRetentionSettings()
     # web publisher settings
     web_publisher_settings: WebPublisherSettings = WebPublisherSettings()
 
@@ -0,0 +1,32 @@
+import click
+
+from agio.core.plugins.base_command import ACommandPlugin
+
+
+class PublishCleanCommand(ACommandPlugin):
+    name = 'publish_clean_cmd'
+    command_name = 'pubclean'
+    arguments = [
+        click.option("-d", "--dry-run", is_flag=True, help='Show sessions to remove without removing'),
+        click.option("--max-age-days", type=float, help='Override max age of sessions', required=False),
+        click.option("--max-count", type=int, help='Override max sessions count', required=False),
+        click.option("--max-total-mb", type=float, help='Override max total size', required=False),
+    ]
+
+    def execute(self, dry_run: bool, max_age_days: float, max_count: int, max_total_mb: float):
+        from agio.core.entities import AWorkspace
+        from agio_pipe.package_settings.workspace_settings import SessionRetentionSettings
+        from agio_pipe.publish.session_cleaner import SessionCleaner
+
+        policy = None
+        ws = AWorkspace.current()
+        if ws is not None:
+            policy = ws.get_settings().get('agio_pipe.session_retention', None)
+        policy = policy or SessionRetentionSettings()
+        overrides = dict(max_age_days=max_age_days, max_count=max_count, max_total_mb=max_total_mb)
+        policy = policy.model_copy(update={k: v for k, v in overrides.items() if v is not None})
+        cleaner = SessionCleaner(policy)
+        result = cleaner.clean(dry_run=dry_run)
+        for session_id in result.removed:
+            click.echo(f'{"Will remove" if dry_run else "Removed"}: {session_id}')
+        click.secho(str(result), fg='yellow' if dry_run else 'green')
@@ -5,6 +5,7 @@ import traceback
 import click
 
 from agio.core.plugins.base_command import ACommandPlugin
+from agio_pipe.exceptions import NoChangesError
 from agio_pipe.publish import publish_core
 from agio.tools import modules
 
@@ -23,10 +24,12 @@ class PublishCommand(ACommandPlugin):
         click.option("-i", "--instances", multiple=True, help='Instances to publish by name (default all)', required=False),
         click.option("-s", "--session-id", help='Suspended session ID', required=False),
         click.option("-d", "--dry-run", is_flag=True, help='Dry run'),
+        click.option("-f", "--force", is_flag=True, help='Publish instances with not changed sources too'),
     ]
     allow_extra_args = True
 
-    def execute(self, scene_file: str, task_id: str, ui: bool, instances: list[str], dry_run: str, session_id: str, **kwargs):
+    def execute(self, scene_file: str, task_id: str, ui: bool, instances: list[str], dry_run: str, session_id: str,
+                force: bool, **kwargs):
         if ui:
             self.open_dialog(scene_file, task_id, instances)
         else:
@@ -35,7 +38,8 @@ class PublishCommand(ACommandPlugin):
             extra_args, extra_kwargs = self.parse_extra_args(kwargs)
             if extra_args:
                 raise click.BadParameter('Extra non keyword arguments provided but not supported')
-            self.start_publish(scene_file, instances, dry_run=dry_run, session_id=session_id, **extra_kwargs)
+            self.start_publish(scene_file, instances, dry_run=dry_run, session_id=session_id, force=force,
+                               **extra_kwargs)
 
     def open_dialog(self, scene_file: str|None, task_id: str,  instances: list[str]):
         core = publish_core.PublishCore()
@@ -58,5 +62,9 @@ class PublishCommand(ACommandPlugin):
         click.secho(f'Start Publish...', fg='yellow')
         # TODO pass options from pipeline settings
         core = publish_core.PublishCore()
-        session = core.start_publishing(scene_file=scene_file, selected_instances=instances, **kwargs)
+        try:
+            session = core.start_publishing(scene_file=scene_file, selected_instances=instances, **kwargs)
+        except NoChangesError:
+            click.secho('Nothing to publish, sources are not changed (use --force to publish anyway)', fg='yellow')
+            return
         click.echo(f'Publish Session ID: "{session.id}"')
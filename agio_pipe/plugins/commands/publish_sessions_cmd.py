@@ -0,0 +1,41 @@
+import time
+from datetime import datetime
+
+import click
+
+from agio.core.plugins.base_command import ACommandPlugin
+
+
+class PublishSessionsCommand(ACommandPlugin):
+    name = 'publish_sessions_cmd'
+    command_name = 'pubsessions'
+    arguments = [
+        click.option("-s", "--status", multiple=True, help='Filter by status (repeatable)', required=False),
+        click.option("-t", "--task-id", help='Filter by task ID', required=False),
+        click.option("-f", "--failed", is_flag=True, help='Failed sessions only'),
+        click.option("-p", "--suspended", is_flag=True, help='Not finished sessions only (can be resumed with "pub -s")'),
+        click.option("-d", "--days", type=float, help='Sessions created during last N days', required=False),
+        click.option("-n", "--limit", type=int, default=20, show_default=True, help='Max sessions count'),
+    ]
+
+    def execute(self, status: tuple[str], task_id: str, failed: bool, suspended: bool, days: float, limit: int):
+        from agio_pipe.publish.publish_session import PublishSession
+        from agio_pipe.publish.session_store import SqliteSessionStore
+
+        statuses = {s.upper() for s in status}
+        if failed:
+            statuses.add(PublishSession.STATUS.FAILED)
+        if suspended:
+            statuses.update((PublishSession.STATUS.PENDING, PublishSession.STATUS.IN_PROGRESS))
+        sessions = SqliteSessionStore.query(
+            status=statuses or None,
+            task_id=task_id,
+            created_after=time.time() - days * 86400 if days else None,
+            limit=limit,
+        )
+        if not sessions:
+            click.echo('No sessions found')
+            return
+        for info in sessions:
+            updated = datetime.fromtimestamp(info.updated_at).strftime('%Y-%m-%d %H:%M:%S')
+            click.echo(f'{updated}  {info.status or "-":>12}  {info.id}  {info.name or ""}')
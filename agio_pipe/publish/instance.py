@@ -1,15 +1,25 @@
 from __future__ import annotations
 
+import time
 import uuid
+from collections.abc import Iterator, MutableMapping
+from enum import StrEnum
 from typing import Any
 
 from agio.core.entities import BaseObject, version as vers
 from agio_pipe.base_classes.export_container import ExportContainerBase
 from agio.core.entities.product import AProduct
 from agio.core.entities.task import ATask
+from agio_pipe.utils.entity_cache import get_entity, register_entity
 
 
 class PublishInstance:
+    class CHECKPOINT(StrEnum):
+        """Completed publish stages, stored with the session to resume it"""
+        EXPORTED = 'exported'
+        REGISTERED = 'registered'
+        FILES_VERIFIED = 'files_verified'
+
     def __init__(
             self,
             task: str|ATask,
@@ -23,8 +33,9 @@ class PublishInstance:
             data: dict[str, Any] = None
         ):
         self.id = id or uuid.uuid4().hex
-        self.task = ATask(task) if isinstance(task, (str, uuid.UUID)) else task
-        self.product = AProduct(product) if isinstance(product, (str, uuid.UUID)) else product
+        self.task = get_entity(ATask, task) if isinstance(task, (str, uuid.UUID)) else register_entity(task)
+        self.product = (get_entity(AProduct, product) if isinstance(product, (str, uuid.UUID))
+                        else register_entity(product))
         self.name = name or f'{self.task.entity.name}_{self.task.name}_{self.product.name}_{self.product.variant}'
         self.sources = sources or []
         self.options = options or {}
@@ -33,6 +44,8 @@ class PublishInstance:
         self._version = version
         self._results = {}
         self._enabled = True
+        # stage -> completion timestamp
+        self._checkpoints: dict[str, float] = {}
 
     def set_value(self, key: str, value: Any):
         self.data[key] = value
@@ -49,6 +62,28 @@ class PublishInstance:
     def set_version(self, version: int):
         self._version = version
 
+    @property
+    def has_version(self) -> bool:
+        """Version number is set or already fetched"""
+        return self._version is not None
+
+    def set_checkpoint(self, stage: CHECKPOINT) -> float:
+        timestamp = self._checkpoints[str(stage)] = time.time()
+        return timestamp
+
+    def remove_checkpoint(self, stage: CHECKPOINT) -> None:
+        self._checkpoints.pop(str(stage), None)
+
+    def has_checkpoint(self, stage: CHECKPOINT) -> bool:
+        return stage in self._checkpoints
+
+    def clear_checkpoints(self) -> None:
+        self._checkpoints.clear()
+
+    @property
+    def checkpoints(self) -> dict[str, float]:
+        return dict(self._checkpoints)
+
     def serialize(self) -> dict[str, Any]:
         data = dict(
             id=self.id,
@@ -57,12 +92,15 @@ class PublishInstance:
             product_id=self.product.id,
             sources=self.sources,
             options=self.options,
+            dependencies=self.dependencies,
             data=self.data,
             version=self._version,
             enabled=self._enabled,
         )
         if self._results:
             data['results'] = self._results
+        if self._checkpoints:
+            data['checkpoints'] = dict(self._checkpoints)
         return data
 
     @classmethod
@@ -77,8 +115,8 @@ class PublishInstance:
                 inst_data[k] = v
         inst = PublishInstance(
             id=instance_data['id'],
-            task=ATask(instance_data['task_id']),
-            product=AProduct(instance_data['product_id']),
+            task=get_entity(ATask, instance_data['task_id']),
+            product=get_entity(AProduct, instance_data['product_id']),
             sources=instance_data['sources'],
             name=instance_data['name'],
             options=instance_data.get('options') or {},
@@ -87,11 +125,11 @@ class PublishInstance:
         )
         if 'version' in instance_data:
             inst.set_version(instance_data['version'])
-        if 'results' in instance_data:
+        if instance_data.get('results'):
             inst.set_results(**instance_data['results'])
-        if 'enable' in instance_data:
-            if not instance_data['enable']:
-                inst.disable()
+        if not instance_data.get('enabled', instance_data.get('enable', True)):
+            inst.disable()
+        inst._checkpoints.update(instance_data.get('checkpoints') or {})
         return inst
 
     @classmethod
@@ -107,17 +145,22 @@ class PublishInstance:
             # data
         )
 
-    def set_results(self, new_version: vers.AVersion, published_files: list):
+    def set_results(self, new_version: vers.AVersion, published_files: list, source_fingerprint: str = None):
         if isinstance(new_version, dict):
             new_version = BaseObject.deserialize(new_version)
         self._results = dict(
             new_version=new_version,
             published_files=published_files
         )
+        if source_fingerprint:
+            self._results['source_fingerprint'] = source_fingerprint
 
     def get_results(self):
         return self._results
 
+    def clear_results(self):
+        self._results = {}
+
     def disable(self):
         self._enabled = False
 
@@ -144,3 +187,85 @@ class PublishInstance:
     def project(self):
         return self.task.project
 
+
+
+class InstanceRegistry(MutableMapping):
+    """
+    Session instances by id with indexes by name and (task_id, product_id).
+    Stored records are converted to PublishInstance on first access,
+    indexes are built from records without loading them.
+    """
+    def __init__(self, records: dict[str, dict[str, Any]] = None):
+        # id -> PublishInstance or raw record
+        self._items: dict[str, PublishInstance | dict[str, Any]] = {}
+        self._by_name: dict[str, list[str]] = {}
+        self._by_key: dict[tuple[str, str], str] = {}
+        for instance_id, record in (records or {}).items():
+            self[instance_id] = record
+
+    @staticmethod
+    def _index_values(item: PublishInstance | dict[str, Any]) -> tuple[str, tuple[str, str]]:
+        if isinstance(item, dict):
+            return item.get('name'), (str(item.get('task_id')), str(item.get('product_id')))
+        return item.name, (str(item.task.id), str(item.product.id))
+
+    def __getitem__(self, instance_id: str) -> PublishInstance:
+        item = self._items[instance_id]
+        if isinstance(item, dict):
+            item = self._items[instance_id] = PublishInstance.from_dict(item)
+        return item
+
+    def __setitem__(self, instance_id: str, instance: PublishInstance | dict[str, Any]) -> None:
+        if instance_id in self._items:
+            self._unindex(instance_id)
+        self._items[instance_id] = instance
+        name, key = self._index_values(instance)
+        self._by_name.setdefault(name, []).append(instance_id)
+        self._by_key.setdefault(key, instance_id)
+
+    def __delitem__(self, instance_id: str) -> None:
+        self._unindex(instance_id)
+        del self._items[instance_id]
+
+    def _unindex(self, instance_id: str) -> None:
+        name, key = self._index_values(self._items[instance_id])
+        ids = self._by_name.get(name, [])
+        if instance_id in ids:
+            ids.remove(instance_id)
+            if not ids:
+                del self._by_name[name]
+        if self._by_key.get(key) == instance_id:
+            del self._by_key[key]
+
+    def __contains__(self, instance_id: object) -> bool:
+        return instance_id in self._items
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {len(self)} instances, {self.loaded_count} loaded>'
+
+    @property
+    def loaded_count(self) -> int:
+        return sum(not isinstance(item, dict) for item in self._items.values())
+
+    def is_loaded(self, instance_id: str) -> bool:
+        return not isinstance(self._items[instance_id], dict)
+
+    def get_by_name(self, name: str) -> PublishInstance | None:
+        ids = self._by_name.get(name)
+        return self[ids[0]] if ids else None
+
+    def get_by_entities(self, task_id: Any, product_id: Any) -> PublishInstance | None:
+        instance_id = self._by_key.get((str(task_id), str(product_id)))
+        return None if instance_id is None else self[instance_id]
+
+    def serialize(self) -> dict[str, dict[str, Any]]:
+        return {
+            instance_id: item if isinstance(item, dict) else item.serialize()
+            for instance_id, item in self._items.items()
+        }
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import asyncio
 import copy
+import functools
 import logging
 import os
-from typing import Any, Callable
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncGenerator, Awaitable, Callable, Coroutine, Generator, TypeVar
 
 from agio.core.chips import chips_hub
 from agio.core.entities import AWorkspace
@@ -12,13 +15,17 @@ from agio.core.exceptions import SettingsParameterNotExists
 from agio.core.plugins import plugin_hub
 from agio.core.settings import settings_hub
 from agio_pipe.base_classes.export_container import ExportContainerBase
-from agio_pipe.exceptions import PublishError
+from agio_pipe.base_classes.publish_scene import PublishSceneBase
+from agio_pipe.exceptions import NoChangesError, PublishError
 from agio_pipe.publish import instance
 from agio_pipe.publish import publish_session
 from agio_pipe.publish.publish_engine_base_plugin import PublishEngineBasePlugin
+from agio_pipe.utils.entity_cache import entity_scope
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar('T')
+
 
 class PublishCore:
     """
@@ -43,10 +50,86 @@ class PublishCore:
                          scene_file: str | dict = None,
                          selected_instances: list[str] = None,
                          **options) -> publish_session.PublishSession:
+        """
+        Blocking publish, scene API, session, engine and events run in the caller thread
+        """
+        # each task and product is created once per publish
+        with entity_scope():
+            return _run_blocking(self._publish(_PublishSteps(blocking=True), scene_file, selected_instances, options))
+
+    async def start_publishing_async(self,
+                                     scene_file: str | dict = None,
+                                     selected_instances: list[str] = None,
+                                     **options) -> publish_session.PublishSession:
+        """
+        Scene API is called in the event loop thread, network requests and the engine
+        (unless it is natively asynchronous) run in worker threads
+        """
+        # each task and product is created once per publish
+        with entity_scope():
+            return await self._publish(_PublishSteps(blocking=False), scene_file, selected_instances, options)
+
+    async def _publish(self,
+                       steps: _PublishSteps,
+                       scene_file: str | dict | None,
+                       selected_instances: list[str] | None,
+                       options: dict[str, Any]) -> publish_session.PublishSession:
+        """
+        Publish flow of both entry points, blocking steps never suspend
+        """
+        publish_options = self._get_publish_options(options)
+        scene_plugin, task_id = self._open_scene(scene_file, publish_options, options)
+        # create or restore session while instances are collected
+        session_step = steps.start(publish_session.PublishSession, task_id=task_id, **options)
+        try:
+            instances = self._collect_instances(scene_plugin, selected_instances)
+        except BaseException:
+            # do not leave the session thread behind, its error is not relevant
+            await steps.discard(session_step)
+            raise
+        session = await steps.wait(session_step)
+        self._add_instances(session, instances)
+        self._set_scene_file(session, scene_file, scene_plugin)
+        await steps.call(self._skip_unchanged, session, publish_options)
+        # next versions of all products with one round of concurrent requests
+        prefetch_step = steps.start(session.prefetch_versions)
+        publish_plugin = self.get_engine_plugin()
+        await steps.wait(prefetch_step)
+        parameters = self._prepare_engine(session, publish_plugin, publish_options, options)
+        with self._version_subscriptions(session, steps):
+            async with steps.open(session):
+                try:
+                    if steps.blocking:
+                        publish_plugin.execute(session, **parameters)
+                    else:
+                        await publish_plugin.execute_async(session, **parameters)
+                except BaseException:
+                    # engine error is raised, versions created meanwhile are rolled back by the session
+                    await steps.join_handlers(raise_errors=False)
+                    raise
+                await steps.join_handlers()
+                # streaming mode: instances exported before resume
+                await steps.call(session.register_exported)
+                if session.has_pending_registrations:
+                    instances = session.reported_instances
+                    versions = await steps.call(session.finish_registrations)
+                    emit('pipe.publish.product_versions_created', {'instances': instances, 'versions': versions})
+        logger.info('Finish publishing with engine "%s"', publish_plugin.__class__.__name__)
+        return session
+
+    def _get_publish_options(self, options: dict[str, Any]) -> dict[str, Any]:
         publish_options = copy.deepcopy(self.options)
         publish_options.update(options)
-
         emit('pipe.publish.before_start', {'publish_options': publish_options})
+        return publish_options
+
+    def _open_scene(self, scene_file: str | dict | None, publish_options: dict[str, Any],
+                    options: dict[str, Any]) -> tuple[PublishSceneBase | None, str | None]:
+        """
+        Scene and its task, resumed session without scene file uses stored instances and task
+        """
+        if scene_file is None and options.get('session_id'):
+            return None, None
         # get publish scene class for current app
         scene_cls = self.get_scene_api_class(publish_options)
         scene_plugin = scene_cls()
@@ -58,21 +141,56 @@ class PublishCore:
         task_id = scene_plugin.get_task_id()
         if not task_id:
             raise PublishError('No task_id provided')
-        # create or restore session
-        session = publish_session.PublishSession(task_id=task_id, **options)
+        return scene_plugin, task_id
+
+    @staticmethod
+    def _collect_instances(scene_plugin: PublishSceneBase | None,
+                           selected_instances: list[str] = None) -> list[instance.PublishInstance]:
         # fill instances from scene if exists
-        for cont in scene_plugin.iter_containers():
+        instances = []
+        for cont in scene_plugin.iter_containers() if scene_plugin else ():
             cont: ExportContainerBase
             inst = instance.PublishInstance.from_export_container(cont)
             if selected_instances and inst.name in selected_instances:
                 continue
             logger.info('Instance created: %s', inst.name)
+            instances.append(inst)
+        return instances
+
+    @staticmethod
+    def _add_instances(session: publish_session.PublishSession, instances: list[instance.PublishInstance]) -> None:
+        for inst in instances:
+            if session.get_instance_by_entities(inst.task.id, inst.product.id):
+                # restored with checkpoints of previous run
+                logger.info('Instance restored from session: %s', inst.name)
+                continue
             session.add_instance(inst)
         # check instances
         if not session.instances:
             raise PublishError('No instances to process')
-        # start publish
-        publish_plugin = self.get_engine_plugin()
+
+    @staticmethod
+    def _set_scene_file(session: publish_session.PublishSession, scene_file: str | dict | None,
+                        scene_plugin: PublishSceneBase | None) -> None:
+        """Scene file is a part of instances source fingerprint"""
+        if not isinstance(scene_file, str) and scene_plugin is not None:
+            scene_file = getattr(scene_plugin, 'scene_file', None)
+        if isinstance(scene_file, (str, os.PathLike)):
+            session.set_value('scene_file', os.fspath(scene_file))
+
+    @staticmethod
+    def _skip_unchanged(session: publish_session.PublishSession, publish_options: dict[str, Any]) -> None:
+        """
+        Disable instances with not changed sources, raises NoChangesError if nothing to publish
+        """
+        if publish_options.get('force') or not session.settings.get('agio_pipe.skip_unchanged_instances', False):
+            return
+        skipped = session.skip_unchanged()
+        if skipped and not any(inst.enabled for inst in session.iter_instances()):
+            raise NoChangesError()
+
+    def _prepare_engine(self, session: publish_session.PublishSession, publish_plugin: PublishEngineBasePlugin,
+                        publish_options: dict[str, Any], options: dict[str, Any]) -> dict[str, Any]:
         emit('pipe.publish.publish_plugin_created', {
              'publish_options': publish_options,
              'engine': publish_plugin,
@@ -83,20 +201,35 @@ class PublishCore:
         parameters = self.get_plugin_parameters()
         parameters.update(publish_options)
         parameters.update(options)
+        return parameters
+
+    @staticmethod
+    @contextmanager
+    def _version_subscriptions(session: publish_session.PublishSession,
+                               steps: _PublishSteps) -> Generator[None, None, None]:
+        """
+        Create versions when engine reports outputs, events are handled in the engine thread,
+        events of asynchronous engines are handled in worker threads
+        """
+        def create_versions(payload: dict):
+            payload['versions'] = session.create_versions(payload['instances'])
+            emit('pipe.publish.product_versions_created', payload)
 
         def on_instances_ready(event: AEvent):
             """Callback for create versions"""
-            versions = session.create_versions(event.payload['instances'])
-            event.payload['versions'] = versions
-            emit('pipe.publish.product_versions_created', event.payload)
+            steps.handle(create_versions, event.payload)
+
+        def on_instance_ready(event: AEvent):
+            """Streaming mode: register version of one instance in background"""
+            session.register_version(event.payload['instance'])
 
         with subscribe_manager(
                 'pipe.publish.product_outputs_created',
-                on_instances_ready, raise_error=True):
-            with session:
-                publish_plugin.execute(session, **parameters)
-        logger.info('Finish publishing with engine "%s"', publish_plugin.__class__.__name__)
-        return session
+                on_instances_ready, raise_error=True), \
+             subscribe_manager(
+                'pipe.publish.instance_outputs_created',
+                on_instance_ready, raise_error=True):
+            yield
 
     def get_engine_name(self, options: dict[str, Any]) -> str:
         # from options
@@ -129,3 +262,85 @@ class PublishCore:
         if not cls:
             raise ValueError(f"Chip 'scene_api.{chip_name}' not found")
         return cls
+
+
+class _PublishSteps:
+    """
+    Runs network-bound publish steps: in worker threads for asynchronous publish,
+    in the caller thread for blocking publish
+    """
+    def __init__(self, blocking: bool):
+        self.blocking = blocking
+        self._loop = None if blocking else asyncio.get_running_loop()
+        # version creation started by events emitted in the event loop thread
+        self._handlers: list[asyncio.Future] = []
+
+    async def call(self, func: Callable[..., T], *args, **kwargs) -> T:
+        if self.blocking:
+            return func(*args, **kwargs)
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    def start(self, func: Callable[..., T], *args, **kwargs) -> Callable[[], T] | Awaitable[T]:
+        """
+        Start the step in background, blocking step is called on wait
+        """
+        if self.blocking:
+            return functools.partial(func, *args, **kwargs)
+        return asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+
+    async def wait(self, step: Callable[[], T] | Awaitable[T]) -> T:
+        if self.blocking:
+            return step()
+        return await step
+
+    async def discard(self, step: Callable[[], T] | Awaitable[T]) -> None:
+        if not self.blocking:
+            await asyncio.gather(step, return_exceptions=True)
+
+    @asynccontextmanager
+    async def open(self, session: publish_session.PublishSession
+                   ) -> AsyncGenerator[publish_session.PublishSession, None]:
+        if self.blocking:
+            with session:
+                yield session
+        else:
+            async with session:
+                yield session
+
+    def handle(self, func: Callable[..., Any], *args) -> None:
+        """
+        Event handler work, moved to a worker thread if the event is emitted
+        in the event loop thread
+        """
+        if self.blocking or not self._in_loop_thread():
+            func(*args)
+            return
+        self._handlers.append(asyncio.ensure_future(asyncio.to_thread(func, *args)))
+
+    async def join_handlers(self, raise_errors: bool = True) -> None:
+        """
+        Wait for handlers moved to worker threads, first error is raised after all of them are done
+        """
+        handlers, self._handlers = self._handlers, []
+        results = await asyncio.gather(*handlers, return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors and raise_errors:
+            raise errors[0]
+
+    def _in_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+
+def _run_blocking(coroutine: Coroutine[Any, Any, T]) -> T:
+    """
+    Run coroutine which never suspends in the caller thread, works inside a running event loop too
+    """
+    try:
+        coroutine.send(None)
+    except StopIteration as e:
+        return e.value
+    coroutine.close()
+    raise RuntimeError('Blocking publish step was suspended')
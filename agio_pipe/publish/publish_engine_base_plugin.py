@@ -1,6 +1,12 @@
+import asyncio
+import logging
+
+from agio.core.events import emit
 from agio.core.plugins.base_plugin import APlugin
 from agio_pipe.publish.publish_session import PublishSession
 
+logger = logging.getLogger(__name__)
+
 
 class PublishEngineBasePlugin(APlugin):
     plugin_type = 'publish_engine'
@@ -17,3 +23,51 @@ class PublishEngineBasePlugin(APlugin):
 
     def start_publish(self, **options):
         raise NotImplementedError()
+
+    async def execute_async(self, session: PublishSession, **options) -> None:
+        self.session = session
+        return await self.start_publish_async(**options)
+
+    async def start_publish_async(self, **options):
+        """
+        Blocking engine runs in a worker thread, do not block the event loop.
+        Override for natively asynchronous engines or engines which must run in the loop thread.
+        """
+        return await asyncio.to_thread(self.start_publish, **options)
+
+    def run_instances(self, func, max_workers: int = None, fail_fast: bool = True):
+        """
+        Call func(instance) for enabled session instances respecting their dependencies,
+        independent instances run concurrently.
+        Instances exported before the session was resumed are skipped,
+        instances with "product_outputs" after func are marked as exported.
+        """
+        from agio_pipe.publish.scheduler import InstanceScheduler
+
+        max_workers = max_workers or self.session.settings.get('agio_pipe.publish_workers', 4)
+        instances = []
+        for instance in self.session.iter_instances():
+            if not instance.enabled:
+                continue
+            if instance.has_checkpoint(instance.CHECKPOINT.EXPORTED):
+                logger.info('Instance %s exported before resume, skipped', instance.name)
+                continue
+            instances.append(instance)
+
+        def run_instance(instance):
+            result = func(instance)
+            if instance.get_value('product_outputs'):
+                self.session.set_checkpoint(instance, instance.CHECKPOINT.EXPORTED)
+            return result
+
+        report = InstanceScheduler(instances, max_workers).run(run_instance, fail_fast=fail_fast)
+        logger.info('Instances processed: %s', report.summary())
+        report.raise_for_errors()
+        return report
+
+    def report_instance_outputs(self, instance) -> None:
+        """
+        Streaming mode: call when "product_outputs" of one instance are ready,
+        version is registered while other instances are exported
+        """
+        emit('pipe.publish.instance_outputs_created', {'instance': instance, 'session': self.session})
@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import asyncio
+import functools
 import json
 import logging
-import tempfile
+import os
+import sqlite3
+import threading
 import traceback
 from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_EXCEPTION, wait
+from types import MappingProxyType
 from enum import StrEnum
 from functools import cached_property
 from pathlib import Path
@@ -19,17 +25,32 @@ from agio.core.events import emit
 from agio.core.settings.settings_hub import WorkspaceSettingsHub
 from agio.tools.data_helpers import deep_tree
 from agio.tools.json_serializer import to_simple_dict
+from agio_pipe.package_settings.workspace_settings import AlignVersions
+from agio_pipe.schemas.version import PublishedFileFull
 from agio_pipe.utils import template_solver
+from agio_pipe.utils.entity_cache import get_entity, in_scope
+from agio_pipe.utils.template_registry import get_template_solver, PUBLICATION_NAME_TEMPLATE
 from . import instance as inst
 from .instance import PublishInstance
-from .session_store import SessionStore
-from .tools.create_version import create_product_version
+from .session_cleaner import SessionCleaner, session_tempdir
+from .session_store import PublishedFingerprint, SqliteSessionStore
+from .session_sync import SessionSync
+from .tools.create_version import create_product_version, DEFAULT_CHUNK_SIZE, DEFAULT_RETRIES, DEFAULT_FILE_WORKERS
+from .tools.source_fingerprint import source_fingerprint, FINGERPRINT_FIELD
 from ..exceptions import PublishError
 
 logger = logging.getLogger(__name__)
 
 
+def _entity_encode(obj):
+    if hasattr(obj, 'serialize'):
+        return obj.serialize()
+    raise TypeError(f'Cant serialize to dict: {type(obj)} {obj}')
+
+
 class PublishSession:
+    # max length of serialized session data in debug log
+    max_log_data_size = 20000
 
     class STATUS(StrEnum):
         PENDING = 'PENDING'
@@ -46,10 +67,14 @@ class PublishSession:
         self._kwargs = kwargs
         self.delete_on_error = delete_on_error
         self.id: str = session_id
-        self._store_class = store_helper_class or SessionStore
+        self._store_class = store_helper_class or SqliteSessionStore
         self.store_helper = None
+        # full snapshot is written on first change, next changes are set by key
+        self._snapshot_written = False
+        # checkpoints are recorded from worker threads
+        self._store_lock = threading.RLock()
         self._data: dict = self._init_session_data(session_id)
-        if self._data:
+        if session_id is not None:
             if task_id and task_id != self._data.get('task_id'):
                 raise ValueError(f'Session {session_id} already used with task_id: {self._data.get("task_id")}')
             self._task_id = self._data.get('task_id')
@@ -60,7 +85,11 @@ class PublishSession:
         self.settings = self._init_settings(workspace_id)
         self._dry_run = False
         self._session: APublishSession|None = None
+        self._sync: SessionSync|None = None
         self._versions = []
+        # streaming registration: instances reported one by one during export
+        self._registration_executor: ThreadPoolExecutor|None = None
+        self._registrations: list[tuple[PublishInstance, Future]] = []
         self.__is_context_manager_opened = False
 
     def _set_id(self, session_id):
@@ -80,10 +109,19 @@ class PublishSession:
                 client=self.client,
             )
             self._set_id(self._session.id)
+        self._sync = SessionSync(self._session, interval=self._kwargs.get('sync_interval', 2.0))
         self.set_status(self.STATUS.IN_PROGRESS)
+        self._sync.flush()
         self.__is_context_manager_opened = True
         emit('pipe.publish.publish_process_started', {'session': self})
 
+    async def __aenter__(self):
+        await asyncio.to_thread(self.__enter__)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return await asyncio.to_thread(self.__exit__, exc_type, exc_val, exc_tb)
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.__is_context_manager_opened = False
         if exc_type:
@@ -108,13 +146,11 @@ class PublishSession:
             data = self.store_helper.load()
             self.id = data.pop('id')
             session_data.update(data)
-            if session_data['instances']:
-                session_data['instances'] = {
-                    inst_id: inst.PublishInstance.from_dict(data)
-                    for inst_id, data in session_data['instances'].items()
-                }
+            # instances are restored on first access
+            session_data['instances'] = inst.InstanceRegistry(data.get('instances'))
             return session_data
         else:
+            session_data['instances'] = inst.InstanceRegistry()
             return session_data
 
     def _init_settings(self, workspace_id: str|None = None) -> WorkspaceSettingsHub:
@@ -130,6 +166,54 @@ class PublishSession:
             self._data['publication_version'] = APublishSession.get_next_version(self._task_id, client=self.client)
         return self._data['publication_version']
 
+    def prefetch_versions(self, instances: list[PublishInstance] = None, max_workers: int = None) -> dict[str, int]:
+        """
+        Fetch next version numbers of enabled instances concurrently
+        and align them according to "align_product_versions" setting.
+        Must be called before session start to align the publication version too.
+        Versions of instances registered before the session was resumed are not changed.
+        """
+        if instances is None:
+            instances = list(self.iter_instances())
+        registered = [instance for instance in instances if instance.enabled and self._is_registered(instance)]
+        instances = [instance for instance in instances if instance.enabled and not self._is_registered(instance)]
+        product_ids = list(dict.fromkeys(
+            instance.product.id for instance in instances if not instance.has_version))
+        if product_ids:
+            max_workers = max_workers or self.settings.get('agio_pipe.version_registration_workers', 4)
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(product_ids)),
+                                    thread_name_prefix='next_version') as executor:
+                numbers = dict(zip(product_ids, executor.map(in_scope(AVersion.get_next_version_number), product_ids)))
+            for instance in instances:
+                if not instance.has_version:
+                    instance.set_version(numbers[instance.product.id])
+        self._align_versions(instances, registered)
+        for instance in instances:
+            self._record(['instances', instance.id, 'version'], instance.version)
+        return {instance.id: instance.version for instance in instances}
+
+    async def prefetch_versions_async(self, instances: list[PublishInstance] = None,
+                                      max_workers: int = None) -> dict[str, int]:
+        return await asyncio.to_thread(self.prefetch_versions, instances, max_workers)
+
+    def _align_versions(self, instances: list[PublishInstance], registered: list[PublishInstance] = ()) -> None:
+        """
+        Set the same version to instances, versions of registered instances are only taken into account
+        """
+        mode = AlignVersions(self.settings.get('agio_pipe.align_product_versions', None) or AlignVersions.NONE)
+        if mode == AlignVersions.NONE or not instances:
+            return
+        version = max(instance.version for instance in [*instances, *registered])
+        if mode == AlignVersions.ALL:
+            version = max(version, self.publication_version)
+            if self.id is None:
+                # publication is not created yet, it gets the same version
+                self._data['publication_version'] = version
+                self._data.pop('publication_name', None)
+        for instance in instances:
+            instance.set_version(version)
+        logger.info('Product versions aligned to v%03d (%s)', version, mode)
+
     @property
     def publication_name(self):
         if 'publication_name' not in self._data:
@@ -141,64 +225,84 @@ class PublishSession:
         return self._versions
 
     def create_name(self):
-        template = self.settings.get('agio_pipe.publication_name_template')
-        templates = {
-            'default': template
-        }
         context = self.get_session_context()
-        solver = template_solver.TemplateSolver(templates)
-        solved_name = solver.solve('default', context)
+        solver = get_template_solver(self.settings)
+        solved_name = solver.solve(PUBLICATION_NAME_TEMPLATE, context)
         return solved_name
 
+    @property
+    def task_id(self) -> str:
+        return self._task_id
+
     @cached_property
     def client(self):
         return self._kwargs.get('client')
 
     @cached_property
     def task(self):
-        return ATask(self._task_id, client=self.client)
+        return get_entity(ATask, self._task_id, client=self.client)
 
     def get_session_context(self) -> dict:
+        """
+        Template context, values are loaded only if template uses them
+        """
         return {
-            'publication_entity': AEntity.from_id(self._task_id, client=self.client),
-            'publication_version': self.publication_version,
+            'publication_entity': template_solver.LazyEntity(
+                in_scope(functools.partial(get_entity, AEntity.from_id)), self._task_id, client=self.client
+            ),
+            'publication_version': template_solver.LazyValue(lambda: self.publication_version),
         }
 
     def serialize(self):
         return self.to_dict()
 
     def to_dict(self) -> dict:
-
-        def entity_encode(obj):
-            if hasattr(obj, 'serialize'):
-                return obj.serialize()
-            raise TypeError(f'Cant serialize to dict: {type(obj)} {obj}')
-
+        data = {**self._data, 'instances': self._data['instances'].serialize()}
         return {
             'id': self.id,
             'task_id': self._task_id,
-            **to_simple_dict(self._data, entity_encode)
+            **to_simple_dict(data, _entity_encode)
         }
 
     def dump(self) -> Path|None:
         if self._dry_run:
             return None
         data = self.serialize()
-        return self.store_helper.dump(data)
+        path = self.store_helper.dump(data)
+        self._snapshot_written = True
+        return path
+
+    def _record(self, path: list[str], value: Any) -> None:
+        """
+        Save one changed value of session data.
+        Stores without append support rewrite full session.
+        """
+        if self._dry_run or self.store_helper is None:
+            return
+        with self._store_lock:
+            append = getattr(self.store_helper, 'append', None)
+            if append is None or not self._snapshot_written:
+                self.dump()
+                return
+            append(path, to_simple_dict({path[-1]: value}, _entity_encode)[path[-1]])
 
     ###########################################################
 
     def set_status(self, status: STATUS) -> None:
         self._data['status'] = status
-        self.dump()
-        self._session.update(state=status)
+        self._record(['status'], status)
+        self._sync.update(state=status)
 
     @property
     def status(self):
         return self._data.get('status') or self.STATUS.PENDING
 
     def on_error(self, error: Union[str, type[BaseException]]) -> None:
+        if self._registrations:
+            logger.error('Publish failed, versions registered in this session will be deleted.')
+            self._abort_registrations()
         if self.delete_on_error:
+            self._sync.discard()
             self._session.delete()
         else:
             err = {
@@ -207,44 +311,206 @@ class PublishSession:
             if isinstance(error, Exception):
                 err['traceback'] = ''.join(traceback.format_exception(error))
             self._data['error'] = err
+            self._record(['error'], err)
             self.set_status(self.STATUS.FAILED)
+            self._sync.flush()
             self._dump_to_db()
         emit('pipe.publish.publish_process_failed', {'session': self})
+        self._clean_cache()
 
     def on_success(self):
         # TODO check versions exists
         self.set_status(self.STATUS.DONE) # TODO user SYNC status by default
+        self._sync.flush()
         self._dump_to_db()
         emit('pipe.publish.publish_process_done', {'session': self})
+        self._clean_cache()
         return True
 
-    def create_versions(self, instances: list[PublishInstance]) -> list[AVersion]:
-        """Create versions in database"""
+    def _clean_cache(self):
+        """Apply retention policy to local sessions cache"""
+        if self._dry_run or not issubclass(self._store_class, SqliteSessionStore):
+            return
+        policy = self.settings.get('agio_pipe.session_retention', None)
+        SessionCleaner(policy, self._store_class).auto_clean(keep=[self.id])
+
+    def create_versions(self, instances: list[PublishInstance], max_workers: int = None) -> list[AVersion]:
+        """
+        Create versions in database.
+        Instances are registered concurrently, if any registration fails versions created by this call are deleted.
+        Instances registered before the session was resumed are skipped.
+        Results and events follow the instances order.
+        """
         if not self.__is_context_manager_opened:
             raise PublishError('Session context manager is not opened')
         if not instances:
             raise PublishError('No instances to create versions')
-        created: list[tuple[AVersion, PublishInstance]] = []
+        created = {}
+        pending = []
         for instance in instances:
+            if self._is_registered(instance):
+                created[instance.id] = self._reuse_registered(instance)[0]
+                continue
             if not instance.get_value('product_outputs'):
                 raise PublishError(f'Instance has no product outputs {instance}')
+            pending.append(instance)
+        for instance in pending:
+            self._mark_exported(instance)
+        if pending:
+            max_workers = self._get_version_workers(max_workers)
+            file_options = self._get_file_options(min(max_workers, len(pending)))
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(pending)),
+                                    thread_name_prefix='create_version') as executor:
+                create_version = in_scope(self._create_version)
+                futures = [executor.submit(create_version, instance, **file_options) for instance in pending]
+                done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+                for future in not_done:
+                    future.cancel()
+            self._rollback_if_failed(pending, futures)
+            created.update(zip([instance.id for instance in pending], self._apply_created_versions(pending, futures)))
+        self._versions = [created[instance.id] for instance in instances]
+        return self._versions
+
+    async def create_versions_async(self, instances: list[PublishInstance], max_workers: int = None) -> list[AVersion]:
+        return await asyncio.to_thread(self.create_versions, instances, max_workers)
+
+    def register_version(self, instance: PublishInstance) -> Future:
+        """
+        Start version registration of one exported instance in background.
+        Registration runs while other instances are exported, results are applied
+        by finish_registrations in the order instances were reported.
+        """
+        if not self.__is_context_manager_opened:
+            raise PublishError('Session context manager is not opened')
+        if self._is_registered(instance):
+            future = Future()
+            future.set_result(self._reuse_registered(instance))
+            return future
+        if not instance.get_value('product_outputs'):
+            raise PublishError(f'Instance has no product outputs {instance}')
+        # engines report instances from concurrent threads
+        with self._store_lock:
+            for reported, future in self._registrations:
+                if reported.id == instance.id:
+                    return future
+                # stop export as soon as any registration failed
+                if future.done() and future.exception() is not None:
+                    raise future.exception()
+            self._mark_exported(instance)
+            if self._registration_executor is None:
+                self._registration_executor = ThreadPoolExecutor(
+                    max_workers=self._get_version_workers(), thread_name_prefix='register_version')
+            future = self._registration_executor.submit(
+                in_scope(self._create_version), instance, **self._get_file_options(self._get_version_workers()))
+            # results are stored right away, resume keeps the version if the process is killed
+            future.add_done_callback(functools.partial(self._on_version_registered, instance))
+            self._registrations.append((instance, future))
+        return future
+
+    def _on_version_registered(self, instance: PublishInstance, future: Future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
         try:
-            for instance in instances:
-                version, files = create_product_version(
-                    product_id=instance.product.id,
-                    task_id=instance.task.id,
-                    version=instance.version,
-                    project_files=instance.get_value('product_outputs'),
-                    publish_session_id=self.id
-                )
-                instance.set_results(version, files)
-                created.append((version, instance))
-        except Exception:
+            self._store_results(instance, *future.result())
+        except Exception as e:
+            logger.warning('Failed to store results of %s: %s', instance.name, e)
+
+    def register_exported(self) -> list[Future]:
+        """
+        Streaming mode: start registration of instances exported before the session was resumed
+        """
+        reported = {instance.id for instance in self.reported_instances}
+        return [
+            self.register_version(instance) for instance in self.iter_instances()
+            if instance.enabled and instance.id not in reported
+            and instance.has_checkpoint(instance.CHECKPOINT.EXPORTED) and not self._is_registered(instance)
+        ]
+
+    @property
+    def has_pending_registrations(self) -> bool:
+        return bool(self._registrations)
+
+    @property
+    def reported_instances(self) -> list[PublishInstance]:
+        """Instances with background registration not finished yet"""
+        return [instance for instance, _ in self._registrations]
+
+    def finish_registrations(self) -> list[AVersion]:
+        """
+        Wait for reported instances, all versions registered in background are deleted if any failed
+        """
+        registrations, self._registrations = self._registrations, []
+        if not registrations:
+            return []
+        instances = [instance for instance, _ in registrations]
+        futures = [future for _, future in registrations]
+        try:
+            wait(futures, return_when=FIRST_EXCEPTION)
+            if any(f.done() and f.exception() is not None for f in futures):
+                for future in futures:
+                    future.cancel()
+        finally:
+            # done callbacks are finished too
+            self._shutdown_registrations()
+        self._rollback_if_failed(instances, futures)
+        versions = self._apply_created_versions(instances, futures)
+        self._versions.extend(versions)
+        return versions
+
+    async def finish_registrations_async(self) -> list[AVersion]:
+        return await asyncio.to_thread(self.finish_registrations)
+
+    def _abort_registrations(self) -> None:
+        """Delete versions registered in background"""
+        with self._store_lock:
+            registrations, self._registrations = self._registrations, []
+        for _, future in registrations:
+            future.cancel()
+        self._shutdown_registrations()
+        for instance, future in registrations:
+            if not future.cancelled() and future.exception() is None:
+                self._delete_version(future.result()[0])
+                self._forget_results(instance)
+
+    def _shutdown_registrations(self) -> None:
+        if self._registration_executor is not None:
+            self._registration_executor.shutdown(wait=True)
+            self._registration_executor = None
+
+    def _rollback_if_failed(self, instances: list[PublishInstance], futures: list[Future]) -> None:
+        errors = [f.exception() for f in futures if not f.cancelled() and f.exception() is not None]
+        if errors:
             logger.error(
                 'Failed to create new version. Early created versions in current session will be deleted.')
-            for version, instance in created:
-                version.delete()
-            raise
+            for instance, future in zip(instances, futures):
+                if not future.cancelled() and future.exception() is None:
+                    self._delete_version(future.result()[0])
+                    self._forget_results(instance)
+            raise errors[0]
+
+    def _store_results(self, instance: PublishInstance, version: AVersion, files: list[dict]) -> None:
+        instance.set_results(version, files, self._get_version_fingerprint(instance))
+        self._record(['instances', instance.id, 'results'], instance.get_results())
+        self.set_checkpoint(instance, instance.CHECKPOINT.REGISTERED)
+
+    def _forget_results(self, instance: PublishInstance) -> None:
+        """Version of the instance is deleted by rollback"""
+        if not instance.get_results():
+            return
+        instance.clear_results()
+        instance.remove_checkpoint(instance.CHECKPOINT.REGISTERED)
+        instance.remove_checkpoint(instance.CHECKPOINT.FILES_VERIFIED)
+        self._record(['instances', instance.id, 'results'], None)
+        self._record(['instances', instance.id, 'checkpoints'], instance.checkpoints)
+
+    def _apply_created_versions(self, instances: list[PublishInstance], futures: list[Future]) -> list[AVersion]:
+        created: list[tuple[AVersion, PublishInstance]] = []
+        for instance, future in zip(instances, futures):
+            version, files = future.result()
+            if instance.get_results().get('new_version') is not version:
+                self._store_results(instance, version, files)
+            self.verify_published_files(instance)
+            created.append((version, instance))
         for version, instance in created:
             emit('pipe.publish.version_created', {
                 'version': version,
@@ -252,23 +518,219 @@ class PublishSession:
                 'session': self
             })
             logger.info('Created new version: %s', repr(version))
-        self._versions = [x[0] for x in created]
-        return self._versions
+        self._sync.flush()
+        self._update_fingerprints([instance for _, instance in created])
+        return [x[0] for x in created]
+
+    def get_source_fingerprint(self, instance: PublishInstance) -> str | None:
+        """
+        Fingerprint of instance sources, scene file and options, calculated once per instance.
+        None if sources are not files.
+        """
+        if FINGERPRINT_FIELD not in instance.data:
+            instance.set_value(FINGERPRINT_FIELD, source_fingerprint(
+                instance.sources, instance.options,
+                content_hash=self.settings.get('agio_pipe.fingerprint_content_hash', False),
+                scene_file=self.get_value('scene_file')))
+        return instance.get_value(FINGERPRINT_FIELD)
+
+    def skip_unchanged(self, instances: list[PublishInstance] = None, max_workers: int = None) -> list[PublishInstance]:
+        """
+        Disable instances with sources and options not changed since their version published from this host,
+        if that version is still the last version of the product. Instances depending on changed
+        instances are published anyway. Skipped instances get "unchanged_version_id" value.
+        """
+        if not issubclass(self._store_class, SqliteSessionStore):
+            return []
+        if instances is None:
+            instances = list(self.iter_instances())
+        # resumed instances are continued
+        candidates = [instance for instance in instances if instance.enabled and not instance.checkpoints]
+        if not candidates:
+            return []
+        max_workers = min(max_workers or self.settings.get('agio_pipe.publish_workers', 4), len(candidates))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fingerprint') as executor:
+            fingerprints = list(executor.map(in_scope(self.get_source_fingerprint), candidates))
+        published = self._store_class.get_fingerprints(
+            (instance.task.id, instance.product.id) for instance in candidates)
+        unchanged: dict[str, PublishedFingerprint] = {}
+        for instance, fingerprint in zip(candidates, fingerprints):
+            record = published.get((str(instance.task.id), str(instance.product.id)))
+            if fingerprint is not None and record is not None and record.fingerprint == fingerprint:
+                unchanged[instance.id] = record
+        if unchanged:
+            # version published after ours (e.g. from other host) is newer than the unchanged sources
+            to_check = [instance for instance in candidates if instance.id in unchanged]
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(to_check)),
+                                    thread_name_prefix='next_version') as executor:
+                numbers = list(executor.map(in_scope(AVersion.get_next_version_number),
+                                            [i.product.id for i in to_check]))
+            for instance, number in zip(to_check, numbers):
+                if number != unchanged[instance.id].version + 1:
+                    del unchanged[instance.id]
+                    instance.set_version(number)
+        self._keep_changed_dependents(instances, unchanged)
+        skipped = []
+        for instance in candidates:
+            if instance.id not in unchanged:
+                continue
+            instance.disable()
+            instance.set_value('unchanged_version_id', unchanged[instance.id].version_id)
+            self._record(['instances', instance.id, 'enabled'], False)
+            self._record(['instances', instance.id, 'data'], instance.data)
+            logger.info('Sources of %s not changed since v%03d, skipped', instance.name, unchanged[instance.id].version)
+            skipped.append(instance)
+        return skipped
+
+    async def skip_unchanged_async(self, instances: list[PublishInstance] = None,
+                                   max_workers: int = None) -> list[PublishInstance]:
+        return await asyncio.to_thread(self.skip_unchanged, instances, max_workers)
+
+    @staticmethod
+    def _keep_changed_dependents(instances: list[PublishInstance], unchanged: dict[str, Any]) -> None:
+        """Remove instances depending on published instances from unchanged"""
+        ids = {instance.name: instance.id for instance in instances}
+        ids.update((instance.id, instance.id) for instance in instances)
+        published = {instance.id for instance in instances if instance.enabled} - set(unchanged)
+        changed = True
+        while changed:
+            changed = False
+            for instance in instances:
+                if instance.id in unchanged and any(ids.get(dep) in published for dep in instance.dependencies):
+                    del unchanged[instance.id]
+                    published.add(instance.id)
+                    changed = True
+
+    def _update_fingerprints(self, instances: list[PublishInstance]) -> None:
+        if self._dry_run or not instances or not issubclass(self._store_class, SqliteSessionStore):
+            return
+        records = {}
+        for instance in instances:
+            results = instance.get_results()
+            if not results.get('source_fingerprint'):
+                continue
+            records[(instance.task.id, instance.product.id)] = PublishedFingerprint(
+                results['source_fingerprint'], results['new_version'].id, instance.version)
+        if not records:
+            return
+        try:
+            self._store_class.set_fingerprints(records)
+        except sqlite3.Error as e:
+            logger.warning('Failed to save source fingerprints: %s', e)
+
+    def set_checkpoint(self, instance: PublishInstance, stage: PublishInstance.CHECKPOINT) -> None:
+        """
+        Mark publish stage of the instance completed, stages completed before
+        are skipped when the session is resumed
+        """
+        # checkpoints are set from export and registration threads
+        with self._store_lock:
+            timestamp = instance.set_checkpoint(stage)
+            if stage == instance.CHECKPOINT.EXPORTED:
+                # outputs are required to register version after resume
+                self._record(['instances', instance.id, 'data'], instance.data)
+            self._record(['instances', instance.id, 'checkpoints', stage], timestamp)
+
+    def _mark_exported(self, instance: PublishInstance) -> None:
+        with self._store_lock:
+            if not instance.has_checkpoint(instance.CHECKPOINT.EXPORTED):
+                self.set_checkpoint(instance, instance.CHECKPOINT.EXPORTED)
+
+    @staticmethod
+    def _is_registered(instance: PublishInstance) -> bool:
+        return instance.has_checkpoint(instance.CHECKPOINT.REGISTERED) and bool(instance.get_results())
+
+    def _reuse_registered(self, instance: PublishInstance) -> tuple[AVersion, list[dict]]:
+        results = instance.get_results()
+        logger.info('Version of %s registered before resume: %r', instance.name, results['new_version'])
+        if not instance.has_checkpoint(instance.CHECKPOINT.FILES_VERIFIED):
+            self.verify_published_files(instance)
+        return results['new_version'], results['published_files']
+
+    def verify_published_files(self, instance: PublishInstance) -> list[str]:
+        """
+        Check published files of the instance exist, returns missing paths
+        """
+        missing = [file.publish_path for file in self._get_product_outputs(instance)
+                   if not os.path.exists(file.publish_path)]
+        if missing:
+            logger.warning('%s published files of %s not found: %s', len(missing), instance.name, missing[0])
+        else:
+            self.set_checkpoint(instance, instance.CHECKPOINT.FILES_VERIFIED)
+        return missing
+
+    @staticmethod
+    def _get_product_outputs(instance: PublishInstance) -> list[PublishedFileFull]:
+        # outputs restored from session store are dicts
+        return [PublishedFileFull(**file) if isinstance(file, dict) else file
+                for file in instance.get_value('product_outputs') or []]
+
+    def _get_version_workers(self, max_workers: int = None) -> int:
+        return max_workers or self._kwargs.get('version_workers') or self.settings.get(
+            'agio_pipe.version_registration_workers', 4)
+
+    def _get_file_options(self, concurrent_versions: int = 1) -> dict:
+        """
+        Files registration options, file workers are shared by versions registered concurrently
+        """
+        file_workers = self.settings.get('agio_pipe.published_files_workers', DEFAULT_FILE_WORKERS)
+        return dict(
+            chunk_size=self.settings.get('agio_pipe.published_files_chunk_size', DEFAULT_CHUNK_SIZE),
+            retries=self.settings.get('agio_pipe.published_files_retries', DEFAULT_RETRIES),
+            max_workers=max(file_workers // max(concurrent_versions, 1), 1),
+        )
+
+    def _get_version_fingerprint(self, instance: PublishInstance) -> str | None:
+        """
+        Fingerprint stored with the version: sources are not read again
+        unless unchanged instances are skipped
+        """
+        if FINGERPRINT_FIELD in instance.data or self.settings.get('agio_pipe.skip_unchanged_instances', False):
+            return self.get_source_fingerprint(instance)
+        return None
+
+    def _create_version(self, instance: PublishInstance, **options) -> tuple[AVersion, list[dict]]:
+        fingerprint = self._get_version_fingerprint(instance)
+        return create_product_version(
+            product_id=instance.product.id,
+            task_id=instance.task.id,
+            version=instance.version,
+            project_files=self._get_product_outputs(instance),
+            publish_session_id=self.id,
+            fields={FINGERPRINT_FIELD: fingerprint} if fingerprint else None,
+            **options
+        )
+
+    @staticmethod
+    def _delete_version(version: AVersion) -> None:
+        try:
+            version.delete()
+        except Exception as e:
+            logger.error('Failed to delete version %r: %s', version, e)
 
     def _dump_to_db(self):
         if self._dry_run:
             return
         if self._session:
-            ###
-            print(' Dump data '.center(150, '='))
-            print(json.dumps(self.serialize(), indent=1))
-            print('='*150)
-            ###
             # TODO: add logs and data
-            self.set_status(self.status)
+            # write final snapshot
+            self.dump()
+            self._log_session_data()
         else:
             logger.error('Session instance not created')
 
+    def _log_session_data(self):
+        data = self.serialize()
+        logger.info(
+            'Publish session %s finished: status=%s instances=%s versions=%s',
+            self.id, self.status, len(data.get('instances') or {}), len(self._versions),
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            text = json.dumps(data, ensure_ascii=False, default=str)
+            if len(text) > self.max_log_data_size:
+                text = f'{text[:self.max_log_data_size]}... ({len(text)} chars total)'
+            logger.debug('Publish session %s data: %s', self.id, text)
+
     @property
     def data(self):
         return self._data
@@ -284,17 +746,19 @@ class PublishSession:
         return dict(self._data.get('context', {}))
 
     @property
-    def instances(self) -> dict[str, inst.PublishInstance]:
-        return dict(self._data.get('instances', {}))
+    def instances(self) -> MappingProxyType[str, inst.PublishInstance]:
+        """Read-only view of the instance registry, instances are loaded on access"""
+        return MappingProxyType(self._data['instances'])
 
     def add_instance(self, instance: inst.PublishInstance):
         if not isinstance(instance, inst.PublishInstance):
             raise TypeError(f"Instance object must be typeinstance.PublishInstance, not {type(instance)}")
         if instance.id in self.instances:
             raise ValueError(f"Instance with ID {instance.id} already exists")
-        if instance in self.instances.values():
+        if self._data['instances'].get_by_entities(instance.task.id, instance.product.id):
             raise ValueError(f"Instance with same product and task already exists: {instance}")
         self._data['instances'][instance.id] = instance
+        self._record(['instances', instance.id], instance.serialize())
         emit('pipe.publish.instance_added', {'instance': instance, 'session': self})
         return instance
 
@@ -306,7 +770,10 @@ class PublishSession:
 
         if instance_id not in self.instances:
             raise ValueError(f"Instance {instance_id} not registered")
-        del self.instances[instance_id]
+        del self._data['instances'][instance_id]
+        if self.store_helper is not None:
+            # removal can not be appended
+            self.dump()
 
     def get_instance(self, instance_id: UUID | str) -> inst.PublishInstance | None:
         if isinstance(instance_id, UUID):
@@ -318,17 +785,17 @@ class PublishSession:
             instance_id = str(instance_id)
         elif isinstance(instance_id, inst.PublishInstance):
             instance_id = instance_id.id
-        return self.instances.get(instance_id) is not None
+        return instance_id in self.instances
 
     def get_instance_by_name(self, name: str) -> inst.PublishInstance | None:
-        for inst in self.instances.values():
-            if inst.name == name:
-                return inst
-        return None
+        return self._data['instances'].get_by_name(name)
+
+    def get_instance_by_entities(self, task_id: UUID | str, product_id: UUID | str) -> inst.PublishInstance | None:
+        return self._data['instances'].get_by_entities(task_id, product_id)
 
     def iter_instances(self) -> Generator[inst.PublishInstance, None, None]:
         yield from self.instances.values()
 
     @property
     def tempdir(self) -> Path:
-        return Path(tempfile.gettempdir(), self.id)
+        return session_tempdir(self.id)
@@ -0,0 +1,188 @@
+"""
+Dependency-aware execution of publish instances.
+
+Instance dependencies are ids or names of other instances of the same session,
+other values (e.g. ids of already published versions) are ignored.
+Instances run on a thread pool as soon as all their dependencies are done,
+dependents of a failed instance are not started.
+
+    scheduler = InstanceScheduler(session.iter_instances(), max_workers=8)
+    report = scheduler.run(export_instance)
+    report.raise_for_errors()
+    logger.info(report.summary())
+"""
+from __future__ import annotations
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+
+from agio_pipe.exceptions import DependencyCycleError
+from agio_pipe.utils.entity_cache import in_scope
+from .instance import PublishInstance
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class InstanceTiming:
+    instance_id: str
+    name: str
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class ScheduleReport:
+    timings: dict[str, InstanceTiming] = field(default_factory=dict)
+    results: dict[str, Any] = field(default_factory=dict)
+    errors: dict[str, BaseException] = field(default_factory=dict)
+    # not started because dependency failed or execution stopped
+    skipped: list[str] = field(default_factory=list)
+    critical_path: list[str] = field(default_factory=list)
+    critical_path_duration: float = 0.0
+    total_duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors and not self.skipped
+
+    def raise_for_errors(self) -> None:
+        if self.errors:
+            raise next(iter(self.errors.values()))
+
+    def summary(self) -> str:
+        path = ' -> '.join(self.timings[i].name for i in self.critical_path)
+        return (f'{len(self.timings)} instances in {self.total_duration:.2f}s, '
+                f'critical path {self.critical_path_duration:.2f}s: {path or "-"}')
+
+
+class InstanceScheduler:
+    def __init__(self, instances: Iterable[PublishInstance], max_workers: int = 4):
+        self.instances: dict[str, PublishInstance] = {inst.id: inst for inst in instances}
+        self.max_workers = max(max_workers, 1)
+        by_name = {inst.name: inst.id for inst in self.instances.values()}
+        self.dependencies: dict[str, list[str]] = {}
+        for inst_id, inst in self.instances.items():
+            deps = []
+            for dep in inst.dependencies:
+                dep_id = dep if dep in self.instances else by_name.get(dep)
+                if dep_id is None:
+                    logger.debug('Dependency %s of %s is not in the session, ignored', dep, inst.name)
+                elif dep_id != inst_id and dep_id not in deps:
+                    deps.append(dep_id)
+            self.dependencies[inst_id] = deps
+        self.dependents: dict[str, list[str]] = {inst_id: [] for inst_id in self.instances}
+        for inst_id, deps in self.dependencies.items():
+            for dep_id in deps:
+                self.dependents[dep_id].append(inst_id)
+
+    def topological_order(self) -> list[PublishInstance]:
+        """
+        Kahn's algorithm, independent instances keep the input order
+        """
+        in_degree = {inst_id: len(deps) for inst_id, deps in self.dependencies.items()}
+        ready = [inst_id for inst_id, degree in in_degree.items() if degree == 0]
+        order = []
+        while ready:
+            inst_id = ready.pop(0)
+            order.append(inst_id)
+            for dependent in self.dependents[inst_id]:
+                in_degree[dependent] -= 1
+                if in_degree[dependent] == 0:
+                    ready.append(dependent)
+        if len(order) < len(self.instances):
+            cycle = [self.instances[i].name for i, degree in in_degree.items() if degree > 0]
+            raise DependencyCycleError(f'Dependency cycle between instances: {", ".join(cycle)}')
+        return [self.instances[inst_id] for inst_id in order]
+
+    def run(self, func: Callable[[PublishInstance], Any], fail_fast: bool = True) -> ScheduleReport:
+        """
+        Call func for every instance, dependencies first.
+        With fail_fast no new instances are started after the first error.
+        """
+        order = [inst.id for inst in self.topological_order()]
+        position = {inst_id: index for index, inst_id in enumerate(order)}
+        report = ScheduleReport()
+        waiting = {inst_id: len(self.dependencies[inst_id]) for inst_id in order}
+        ready = [inst_id for inst_id in order if waiting[inst_id] == 0]
+        running: dict[Future, str] = {}
+        blocked: set[str] = set()
+        stopped = False
+        started_at = time.monotonic()
+
+        @in_scope
+        def execute(inst_id: str):
+            start = time.monotonic()
+            try:
+                return func(self.instances[inst_id])
+            finally:
+                report.timings[inst_id] = InstanceTiming(
+                    inst_id, self.instances[inst_id].name, start - started_at, time.monotonic() - started_at)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='publish_instance') as executor:
+            while ready or running:
+                while ready and not stopped:
+                    inst_id = ready.pop(0)
+                    running[executor.submit(execute, inst_id)] = inst_id
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=lambda f: position[running[f]]):
+                    inst_id = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        logger.error('Instance %s failed: %s', self.instances[inst_id].name, error)
+                        report.errors[inst_id] = error
+                        blocked.update(self._all_dependents(inst_id))
+                        stopped = stopped or fail_fast
+                        continue
+                    report.results[inst_id] = future.result()
+                    for dependent in self.dependents[inst_id]:
+                        waiting[dependent] -= 1
+                        if waiting[dependent] == 0 and dependent not in blocked:
+                            ready.append(dependent)
+        report.total_duration = time.monotonic() - started_at
+        report.skipped = [inst_id for inst_id in order
+                          if inst_id not in report.timings]
+        report.critical_path, report.critical_path_duration = self.critical_path(report.timings)
+        return report
+
+    def critical_path(self, timings: dict[str, InstanceTiming]) -> tuple[list[str], float]:
+        """
+        Longest chain of dependent instances by execution time
+        """
+        finish: dict[str, float] = {}
+        previous: dict[str, str | None] = {}
+        for inst in self.topological_order():
+            if inst.id not in timings:
+                continue
+            best_dep = max((dep for dep in self.dependencies[inst.id] if dep in finish),
+                           key=finish.get, default=None)
+            finish[inst.id] = timings[inst.id].duration + (finish[best_dep] if best_dep else 0.0)
+            previous[inst.id] = best_dep
+        if not finish:
+            return [], 0.0
+        last = max(finish, key=finish.get)
+        path = []
+        node = last
+        while node is not None:
+            path.append(node)
+            node = previous[node]
+        return path[::-1], finish[last]
+
+    def _all_dependents(self, inst_id: str) -> set[str]:
+        result = set()
+        stack = list(self.dependents[inst_id])
+        while stack:
+            dependent = stack.pop()
+            if dependent not in result:
+                result.add(dependent)
+                stack.extend(self.dependents[dependent])
+        return result
@@ -0,0 +1,190 @@
+"""
+Retention of local publish session data: stored sessions and session temp dirs.
+
+Sessions older than max age (failed sessions have own max age) are removed first,
+then least recently used sessions are removed until count and total size limits are met.
+Failed and then not finished (resumable) sessions are evicted last.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+from agio_pipe.package_settings.workspace_settings import SessionRetentionSettings
+from .session_store import SqliteSessionStore
+
+logger = logging.getLogger(__name__)
+
+_failed_status = 'FAILED'
+_unfinished_statuses = ('PENDING', 'IN_PROGRESS')
+_last_cleanup_file = '.last_cleanup'
+
+
+def session_tempdir(session_id: str) -> Path:
+    return Path(tempfile.gettempdir(), session_id)
+
+
+def _eviction_priority(status: str | None) -> int:
+    if status in _unfinished_statuses:
+        return 2
+    if status == _failed_status:
+        return 1
+    return 0
+
+
+def _tree_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+@dataclass
+class CachedSession:
+    id: str
+    status: str | None
+    last_used: float
+    size: int
+    tempdir: Path | None = None
+
+
+@dataclass
+class CleanupResult:
+    removed: list[str] = field(default_factory=list)
+    freed_bytes: int = 0
+    kept: int = 0
+    total_bytes: int = 0
+
+    def __str__(self):
+        return (f'Removed {len(self.removed)} sessions ({self.freed_bytes / 2**20:.1f} MB), '
+                f'kept {self.kept} ({self.total_bytes / 2**20:.1f} MB)')
+
+
+class SessionCleaner:
+    """
+    LRU cleaner of the local publish sessions cache
+    """
+    def __init__(self, policy: SessionRetentionSettings = None, store_class: type[SqliteSessionStore] = None):
+        self.policy = policy or SessionRetentionSettings()
+        self.store_class = store_class or SqliteSessionStore
+
+    def collect(self) -> list[CachedSession]:
+        sessions = []
+        sizes = self.store_class.get_sizes()
+        for info in self.store_class.query():
+            tempdir = session_tempdir(info.id)
+            last_used = info.updated_at
+            size = sizes.get(info.id, 0)
+            if tempdir.exists():
+                last_used = max(last_used, tempdir.stat().st_mtime)
+                size += _tree_size(tempdir)
+            else:
+                tempdir = None
+            sessions.append(CachedSession(info.id, info.status, last_used, size, tempdir))
+        return sessions
+
+    def select(self, sessions: list[CachedSession], keep: Iterable[str] = (), now: float = None) -> list[CachedSession]:
+        """
+        Sessions to remove according to the policy
+        """
+        now = now or time.time()
+        keep = set(keep)
+        policy = self.policy
+        candidates = [s for s in sessions if s.id not in keep]
+        to_remove = {}
+        for session in candidates:
+            max_age = policy.failed_max_age_days if session.status == _failed_status else policy.max_age_days
+            if now - session.last_used > max_age * 86400:
+                to_remove[session.id] = session
+        remaining = [s for s in sessions if s.id not in to_remove]
+        count = len(remaining)
+        total = sum(s.size for s in remaining)
+        max_bytes = policy.max_total_mb * 2**20
+        lru = sorted(
+            (s for s in candidates if s.id not in to_remove),
+            key=lambda s: (_eviction_priority(s.status), s.last_used)
+        )
+        for session in lru:
+            if count <= policy.max_count and total <= max_bytes:
+                break
+            to_remove[session.id] = session
+            count -= 1
+            total -= session.size
+        return list(to_remove.values())
+
+    def clean(self, keep: Iterable[str] = (), dry_run: bool = False) -> CleanupResult:
+        sessions = self.collect()
+        to_remove = self.select(sessions, keep)
+        result = CleanupResult()
+        for session in to_remove:
+            if not dry_run:
+                try:
+                    self.remove(session)
+                except OSError as e:
+                    logger.warning('Failed to remove publish session %s: %s', session.id, e)
+                    continue
+            result.removed.append(session.id)
+            result.freed_bytes += session.size
+        result.kept = len(sessions) - len(result.removed)
+        result.total_bytes = sum(s.size for s in sessions) - result.freed_bytes
+        if not dry_run:
+            self._remove_migrated_files()
+            self._compact_database(bool(result.removed))
+            self.store_class.store_path.joinpath(_last_cleanup_file).touch()
+        return result
+
+    def _compact_database(self, sessions_removed: bool) -> None:
+        """Drop old source fingerprints and shrink the database file after rows are deleted"""
+        try:
+            pruned = self.store_class.prune_fingerprints(time.time() - self.policy.max_age_days * 86400)
+            if sessions_removed or pruned:
+                self.store_class.vacuum()
+        except sqlite3.Error as e:
+            logger.warning('Publish sessions database compaction failed: %s', e)
+
+    def remove(self, session: CachedSession) -> None:
+        if session.tempdir is not None:
+            shutil.rmtree(session.tempdir)
+        self.store_class(session.id).delete()
+        logger.debug('Publish session %s removed from cache', session.id)
+
+    def _remove_migrated_files(self):
+        """Delete old session files left after migration to database"""
+        expire = time.time() - self.policy.max_age_days * 86400
+        for path in self.store_class.store_path.glob('*.migrated'):
+            if path.stat().st_mtime < expire:
+                path.unlink(missing_ok=True)
+
+    def is_cleanup_due(self) -> bool:
+        stamp = self.store_class.store_path.joinpath(_last_cleanup_file)
+        if not stamp.exists():
+            return True
+        return time.time() - stamp.stat().st_mtime > self.policy.auto_cleanup_interval_minutes * 60
+
+    def auto_clean(self, keep: Iterable[str] = ()) -> CleanupResult | None:
+        """
+        Cleanup after publishing, errors are logged and never raised
+        """
+        try:
+            if not self.policy.enabled or not self.is_cleanup_due():
+                return None
+            result = self.clean(keep)
+            if result.removed:
+                logger.info('Publish sessions cache cleanup: %s', result)
+            return result
+        except Exception as e:
+            logger.warning('Publish sessions cache cleanup failed: %s', e)
+            return None
@@ -1,8 +1,24 @@
 import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Iterable
 
 from agio.tools import local_dirs
 
+logger = logging.getLogger(__name__)
+
+
+def _set_nested_value(data: dict, path: list[str], value: Any) -> None:
+    for key in path[:-1]:
+        data = data.setdefault(key, {})
+    data[path[-1]] = value
+
 
 class SessionStore:
     store_path = Path(local_dirs.cache_dir('publish_sessions'))
@@ -13,8 +29,11 @@ class SessionStore:
     def dump(self, data):
         session_path = self.session_file()
         session_path.parent.mkdir(parents=True, exist_ok=True)
-        with session_path.open('w') as session_file:
+        # write to temp file and replace, interrupted write keeps previous file
+        tmp_path = session_path.with_name(f'{session_path.name}.tmp')
+        with tmp_path.open('w') as session_file:
             json.dump(data, session_file, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, session_path)
         return session_path
 
     def load(self):
@@ -27,3 +46,269 @@ class SessionStore:
 
     def session_file(self) -> Path:
         return self.store_path.joinpath(self.session_id).with_suffix('.json')
+
+
+def load_file_session(session_path: Path) -> dict:
+    """
+    Read session saved by previous file stores: json snapshot with optional
+    ".journal" file of changes, one json line {"path": [...], "value": ...} each
+    """
+    with session_path.open() as session_file:
+        data = json.load(session_file)
+    journal_path = session_path.with_suffix('.journal')
+    if not journal_path.exists():
+        return data
+    with journal_path.open() as journal:
+        for line_number, line in enumerate(journal, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # partial last line of interrupted write
+                logger.warning('Skip broken journal record %s:%s', journal_path, line_number)
+                continue
+            _set_nested_value(data, record['path'], record['value'])
+    return data
+
+
+@dataclass(frozen=True)
+class PublishedFingerprint:
+    fingerprint: str
+    version_id: str
+    version: int
+
+
+@dataclass(frozen=True)
+class SessionInfo:
+    id: str
+    task_id: str | None
+    status: str | None
+    name: str | None
+    created_at: float
+    updated_at: float
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    All sessions in one SQLite database with indexed status, task and timestamps.
+
+    Changes are applied to the stored json with json_set, the row is not rewritten
+    from python. JSON session files found in the store dir are imported on first use
+    and renamed to "*.migrated".
+    """
+    database_name = 'sessions.sqlite'
+    _schema = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            task_id TEXT,
+            status TEXT,
+            name TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS sessions_status ON sessions (status);
+        CREATE INDEX IF NOT EXISTS sessions_task_id ON sessions (task_id);
+        CREATE INDEX IF NOT EXISTS sessions_created_at ON sessions (created_at);
+        CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+        CREATE TABLE IF NOT EXISTS fingerprints (
+            task_id TEXT NOT NULL,
+            product_id TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            version_id TEXT,
+            version INTEGER,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (task_id, product_id)
+        );
+    """
+    _initialized: set[Path] = set()
+    _init_lock = threading.Lock()
+
+    @classmethod
+    def database_file(cls) -> Path:
+        return cls.store_path.joinpath(cls.database_name)
+
+    @classmethod
+    def connect(cls) -> sqlite3.Connection:
+        database_path = cls.database_file()
+        if database_path not in cls._initialized:
+            with cls._init_lock:
+                if database_path not in cls._initialized:
+                    database_path.parent.mkdir(parents=True, exist_ok=True)
+                    with closing(sqlite3.connect(database_path, timeout=30)) as connection:
+                        connection.execute('PRAGMA journal_mode=WAL')
+                        connection.executescript(cls._schema)
+                        cls.migrate_json_files(connection)
+                    cls._initialized.add(database_path)
+        return sqlite3.connect(database_path, timeout=30)
+
+    @classmethod
+    def migrate_json_files(cls, connection: sqlite3.Connection) -> int:
+        """
+        Import sessions saved by file stores
+        """
+        count = 0
+        for session_path in sorted(cls.store_path.glob('*.json')):
+            try:
+                data = load_file_session(session_path)
+            except (OSError, ValueError) as e:
+                logger.warning('Session file %s not migrated: %s', session_path, e)
+                continue
+            mtime = session_path.stat().st_mtime
+            with connection:
+                connection.execute(
+                    'INSERT OR IGNORE INTO sessions (id, task_id, status, name, created_at, updated_at, data) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (data.get('id') or session_path.stem, data.get('task_id'), data.get('status'),
+                     data.get('publication_name'), mtime, mtime, json.dumps(data, ensure_ascii=False))
+                )
+            for path in (session_path, session_path.with_suffix('.journal')):
+                if path.exists():
+                    path.rename(path.with_name(f'{path.name}.migrated'))
+            count += 1
+        if count:
+            logger.info('Migrated %s publish sessions to %s', count, cls.database_file())
+        return count
+
+    def dump(self, data):
+        now = time.time()
+        with closing(self.connect()) as connection, connection:
+            connection.execute(
+                'INSERT INTO sessions (id, task_id, status, name, created_at, updated_at, data) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET task_id=excluded.task_id, status=excluded.status, '
+                'name=excluded.name, updated_at=excluded.updated_at, data=excluded.data',
+                (self.session_id, data.get('task_id'), data.get('status'), data.get('publication_name'),
+                 now, now, json.dumps(data, ensure_ascii=False))
+            )
+        return self.database_file()
+
+    def append(self, path: list[str], value: Any) -> None:
+        """
+        Set the nested key in stored data
+        """
+        json_path = '$' + ''.join('.' + json.dumps(str(key)) for key in path)
+        parent_path = json_path.rsplit('.', 1)[0] if len(path) > 1 else '$'
+        columns = 'status = ?, ' if list(path) == ['status'] else ''
+        params = (value,) if columns else ()
+        with closing(self.connect()) as connection, connection:
+            cursor = connection.execute(
+                f'UPDATE sessions SET {columns}updated_at = ?, data = json_set(data, ?, json(?)) '
+                f'WHERE id = ? AND json_type(data, ?) IS NOT NULL',
+                (*params, time.time(), json_path, json.dumps(value, ensure_ascii=False),
+                 self.session_id, parent_path)
+            )
+            updated = cursor.rowcount
+        if not updated:
+            # session or parent key does not exist
+            data = self.load()
+            _set_nested_value(data, path, value)
+            self.dump(data)
+
+    def load(self):
+        with closing(self.connect()) as connection:
+            row = connection.execute('SELECT data FROM sessions WHERE id = ?', (self.session_id,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"Session not found: {self.session_id}")
+        return json.loads(row[0])
+
+    def delete(self) -> None:
+        with closing(self.connect()) as connection, connection:
+            connection.execute('DELETE FROM sessions WHERE id = ?', (self.session_id,))
+
+    @classmethod
+    def query(cls,
+              status: str | Iterable[str] = None,
+              task_id: str = None,
+              created_after: float = None,
+              updated_before: float = None,
+              order_by: str = 'updated_at',
+              limit: int = None) -> list[SessionInfo]:
+        """
+        Find sessions by indexed fields, newest first
+        """
+        if order_by not in ('created_at', 'updated_at'):
+            raise ValueError(f'Incorrect order field: {order_by}')
+        conditions = []
+        params = []
+        if status is not None:
+            statuses = [status] if isinstance(status, str) else list(status)
+            conditions.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if task_id is not None:
+            conditions.append('task_id = ?')
+            params.append(str(task_id))
+        if created_after is not None:
+            conditions.append('created_at >= ?')
+            params.append(created_after)
+        if updated_before is not None:
+            conditions.append('updated_at < ?')
+            params.append(updated_before)
+        sql = 'SELECT id, task_id, status, name, created_at, updated_at FROM sessions'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += f' ORDER BY {order_by} DESC'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        with closing(cls.connect()) as connection:
+            return [SessionInfo(*row) for row in connection.execute(sql, params)]
+
+    @classmethod
+    def get_sizes(cls) -> dict[str, int]:
+        """Stored data size of each session"""
+        with closing(cls.connect()) as connection:
+            return dict(connection.execute('SELECT id, length(data) FROM sessions'))
+
+    @classmethod
+    def load_many(cls, session_ids: Iterable[str]) -> dict[str, dict]:
+        session_ids = list(session_ids)
+        if not session_ids:
+            return {}
+        with closing(cls.connect()) as connection:
+            rows = connection.execute(
+                f"SELECT id, data FROM sessions WHERE id IN ({', '.join('?' * len(session_ids))})",
+                session_ids
+            ).fetchall()
+        return {session_id: json.loads(data) for session_id, data in rows}
+
+    @classmethod
+    def get_fingerprints(cls, keys: Iterable[tuple[str, str]]) -> dict[tuple[str, str], PublishedFingerprint]:
+        """
+        Source fingerprints of the last versions published from this host by (task_id, product_id)
+        """
+        keys = {(str(task_id), str(product_id)) for task_id, product_id in keys}
+        task_ids = list({task_id for task_id, _ in keys})
+        if not task_ids:
+            return {}
+        with closing(cls.connect()) as connection:
+            rows = connection.execute(
+                'SELECT task_id, product_id, fingerprint, version_id, version FROM fingerprints '
+                f"WHERE task_id IN ({', '.join('?' * len(task_ids))})",
+                task_ids
+            ).fetchall()
+        return {(row[0], row[1]): PublishedFingerprint(*row[2:]) for row in rows if (row[0], row[1]) in keys}
+
+    @classmethod
+    def prune_fingerprints(cls, updated_before: float) -> int:
+        """Remove fingerprints of versions published before the time"""
+        with closing(cls.connect()) as connection, connection:
+            return connection.execute('DELETE FROM fingerprints WHERE updated_at < ?', (updated_before,)).rowcount
+
+    @classmethod
+    def vacuum(cls) -> None:
+        """Return space of deleted rows to the file system"""
+        with closing(cls.connect()) as connection:
+            connection.execute('VACUUM')
+
+    @classmethod
+    def set_fingerprints(cls, records: dict[tuple[str, str], PublishedFingerprint]) -> None:
+        now = time.time()
+        with closing(cls.connect()) as connection, connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO fingerprints '
+                '(task_id, product_id, fingerprint, version_id, version, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                [(str(task_id), str(product_id), record.fingerprint, str(record.version_id), record.version, now)
+                 for (task_id, product_id), record in records.items()]
+            )
@@ -0,0 +1,90 @@
+"""
+Coalesced sync of publish session fields to the server.
+
+Updates are merged in memory and sent as one request with fields changed since
+the last successful sync. Pending changes are sent by timer or by explicit flush
+at phase boundaries (session start, versions created, session end).
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any
+
+from agio.core.entities.publish_session import APublishSession
+
+logger = logging.getLogger(__name__)
+
+_missing = object()
+
+
+class SessionSync:
+    def __init__(self, session: APublishSession, interval: float = 2.0):
+        self.session = session
+        self.interval = interval
+        self._synced: dict[str, Any] = {}
+        self._pending: dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self._timer: threading.Timer | None = None
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.session} pending: {list(self._pending)}>'
+
+    @property
+    def pending(self) -> dict[str, Any]:
+        with self._lock:
+            return dict(self._pending)
+
+    def update(self, **fields) -> None:
+        """
+        Schedule fields update, last value of each field wins
+        """
+        with self._lock:
+            for key, value in fields.items():
+                if self._synced.get(key, _missing) == value:
+                    self._pending.pop(key, None)
+                else:
+                    self._pending[key] = value
+            if self._pending and self._timer is None and self.interval > 0:
+                self._timer = threading.Timer(self.interval, self._flush_by_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> dict[str, Any]:
+        """
+        Send pending changes, returns sent fields
+        """
+        with self._lock:
+            self._cancel_timer()
+            if not self._pending:
+                return {}
+            changes = self._pending
+            self._pending = {}
+            try:
+                self.session.update(**changes)
+            except Exception:
+                # keep changes for the next flush, newer values have priority
+                self._pending = {**changes, **self._pending}
+                raise
+            self._synced.update(changes)
+            logger.debug('Publish session %s synced: %s', self.session.id, ', '.join(changes))
+            return changes
+
+    def discard(self) -> None:
+        """Drop pending changes, e.g. when remote session is deleted"""
+        with self._lock:
+            self._cancel_timer()
+            self._pending = {}
+
+    def _flush_by_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning('Publish session sync failed, will retry on next flush: %s', e)
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
@@ -1,4 +1,6 @@
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
 
 from agio.core.entities.published_file import APublishedFile
 from agio.core.entities.version import AVersion
@@ -7,6 +9,10 @@ from agio_pipe.schemas.version import PublishedFileFull
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CHUNK_SIZE = 200
+DEFAULT_RETRIES = 2
+DEFAULT_FILE_WORKERS = 4
+
 
 def create_product_version(
         product_id: str,
@@ -14,23 +20,85 @@ def create_product_version(
         publish_session_id: str,
         version: int,
         project_files: list[PublishedFileFull],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        retries: int = DEFAULT_RETRIES,
+        max_workers: int = DEFAULT_FILE_WORKERS,
+        fields: dict = None,
     ) -> tuple[AVersion, list[dict]]:
         version = AVersion.create(
             product_id=product_id,
             task_id=task_id,
             publish_session_id=publish_session_id,
             version=version,
+            fields=fields,
         )
-        files = []
-        for file in project_files:
-            file: PublishedFileFull
-            published_file = APublishedFile.create(
-                version_id=version.id,
-                path=file.publish_path,
-            )
-            published_file_data = {
-                **published_file.to_dict(),
-                'orig_path': file.orig_path  # add original path
-            }
-            files.append(published_file_data)
+        try:
+            files = register_published_files(version.id, project_files, chunk_size, retries, max_workers)
+        except Exception:
+            # version without files is not valid
+            version.delete()
+            raise
         return version, files
+
+
+def register_published_files(
+        version_id: str,
+        project_files: list[PublishedFileFull],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        retries: int = DEFAULT_RETRIES,
+        max_workers: int = DEFAULT_FILE_WORKERS,
+    ) -> list[dict]:
+    """
+    Register files of the version, one request per file (agio core has no bulk endpoint).
+    Files are split in chunks registered concurrently. Failed chunk is retried from
+    the first not registered file, the file is looked up first as the failed
+    request may have created it.
+    Result is {"id", "path", "orig_path"} of each file in the order of project_files.
+    """
+    chunk_size = max(chunk_size, 1)
+    chunks = [project_files[i:i + chunk_size] for i in range(0, len(project_files), chunk_size)]
+    if not chunks:
+        return []
+    if len(chunks) == 1 or max_workers <= 1:
+        return [data for chunk in chunks for data in _register_chunk(version_id, chunk, retries)]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks)),
+                            thread_name_prefix='published_files') as executor:
+        futures = [executor.submit(_register_chunk, version_id, chunk, retries) for chunk in chunks]
+        done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in not_done:
+            future.cancel()
+    return [data for future in futures for data in future.result()]
+
+
+def _find_published_file(version_id: str, path: str) -> APublishedFile | None:
+    found = APublishedFile.find(version_id=version_id, path=path)
+    if found is None or isinstance(found, APublishedFile):
+        return found
+    # list or iterator of matched files
+    return next(iter(found), None)
+
+
+def _register_chunk(version_id: str, chunk: list[PublishedFileFull], retries: int) -> list[dict]:
+    files = []
+    attempt = 0
+    retrying = False
+    while len(files) < len(chunk):
+        file = chunk[len(files)]
+        try:
+            published_file = _find_published_file(version_id, file.publish_path) if retrying else None
+            if published_file is None:
+                published_file = APublishedFile.create(
+                    version_id=version_id,
+                    path=file.publish_path,
+                )
+        except Exception as e:
+            attempt += 1
+            if attempt > retries:
+                raise
+            logger.warning('Published file registration failed, retry %s/%s: %s', attempt, retries, e)
+            time.sleep(0.5 * 2 ** (attempt - 1))
+            retrying = True
+            continue
+        retrying = False
+        files.append({'id': published_file.id, 'path': file.publish_path, 'orig_path': file.orig_path})
+    return files
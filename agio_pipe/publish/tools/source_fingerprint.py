@@ -0,0 +1,49 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterable
+
+FINGERPRINT_FIELD = 'source_fingerprint'
+
+
+def source_fingerprint(sources: Iterable[str], options: dict[str, Any] = None, content_hash: bool = False,
+                       scene_file: str = None) -> str | None:
+    """
+    Hash of the instance sources state, scene file and export options.
+    Files are compared by size and mtime, with content_hash by content too.
+    Files of source directories are included.
+    None if any source is not an existing file or directory (e.g. scene object),
+    such sources can not be compared.
+    """
+    paths = [Path(str(src)) for src in sources]
+    if scene_file is not None:
+        paths.append(Path(scene_file))
+    if not sources or not all(path.exists() for path in paths):
+        return None
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        for file_path, entry in _iter_entries(path, content_hash):
+            digest.update(f'{file_path}\0{entry}\n'.encode('utf-8'))
+    digest.update(json.dumps(options or {}, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _iter_entries(path: Path, content_hash: bool):
+    if path.is_dir():
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = Path(root, name)
+                yield file_path.as_posix(), _file_entry(file_path, content_hash)
+    else:
+        yield path.as_posix(), _file_entry(path, content_hash)
+
+
+def _file_entry(path: Path, content_hash: bool) -> str:
+    stat = path.stat()
+    entry = f'{stat.st_size}:{stat.st_mtime_ns}'
+    if content_hash:
+        with path.open('rb') as f:
+            entry += ':' + hashlib.file_digest(f, 'sha256').hexdigest()
+    return entry
@@ -0,0 +1,153 @@
+"""
+Identity map of agio entities for the duration of a publish.
+
+    with entity_scope() as entities:
+        task = get_entity(ATask, task_id)   # created once
+        ...
+        entities.stats  # {'hits': ..., 'misses': ..., 'evictions': ..., 'size': ...}
+
+Outside of the scope get_entity just creates a new entity.
+Executor threads do not inherit the scope, submitted functions are wrapped with in_scope:
+
+    executor.submit(in_scope(func), *args)
+"""
+from __future__ import annotations
+
+import logging
+import functools
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Generator, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class EntityIdentityMap:
+    """
+    Entities by class and id, least recently used entities are dropped
+    when size limit is reached, entities older than ttl are created again
+    """
+    def __init__(self, ttl: float = 600, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entities: OrderedDict[tuple[type, str], tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entities)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.stats}>'
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return dict(hits=self.hits, misses=self.misses, evictions=self.evictions, size=len(self))
+
+    def get(self, entity_class: type[T], entity_id: Any, **kwargs) -> T:
+        """
+        Get cached entity or create it with entity_class(entity_id, **kwargs)
+        """
+        key = (entity_class, str(entity_id))
+        now = time.monotonic()
+        with self._lock:
+            item = self._entities.get(key)
+            if item is not None and item[1] > now:
+                self._entities.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            self.misses += 1
+        entity = entity_class(entity_id, **kwargs)
+        return self._put(key, entity, now)
+
+    def put(self, entity: Any) -> Any:
+        """
+        Register existing entity, already registered entity with the same id is returned
+        """
+        key = (type(entity), str(entity.id))
+        with self._lock:
+            item = self._entities.get(key)
+            if item is not None and item[1] > time.monotonic():
+                return item[0]
+        return self._put(key, entity, time.monotonic())
+
+    def _put(self, key: tuple[type, str], entity: Any, now: float) -> Any:
+        with self._lock:
+            item = self._entities.get(key)
+            if item is not None and item[1] > now:
+                # created concurrently
+                return item[0]
+            self._entities[key] = (entity, now + self.ttl)
+            self._entities.move_to_end(key)
+            while len(self._entities) > self.max_size:
+                self._entities.popitem(last=False)
+                self.evictions += 1
+        return entity
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entities.clear()
+
+
+_current_map: ContextVar[EntityIdentityMap | None] = ContextVar('entity_identity_map', default=None)
+
+
+def get_entity(entity_class: type[T], entity_id: Any, **kwargs) -> T:
+    identity_map = _current_map.get()
+    if identity_map is None:
+        return entity_class(entity_id, **kwargs)
+    return identity_map.get(entity_class, entity_id, **kwargs)
+
+
+def register_entity(entity: T) -> T:
+    """Put entity created elsewhere to the current scope"""
+    identity_map = _current_map.get()
+    if identity_map is None or entity is None:
+        return entity
+    return identity_map.put(entity)
+
+
+def current_identity_map() -> EntityIdentityMap | None:
+    return _current_map.get()
+
+
+def in_scope(func: Callable[..., T]) -> Callable[..., T]:
+    """
+    Bind func to the identity map of the caller, e.g. to run it in executor threads
+    """
+    identity_map = _current_map.get()
+    if identity_map is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current_map.set(identity_map)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_map.reset(token)
+    return wrapper
+
+
+@contextmanager
+def entity_scope(identity_map: EntityIdentityMap = None) -> Generator[EntityIdentityMap, None, None]:
+    """
+    Activate identity map, nested scope reuses the outer map
+    """
+    if identity_map is None:
+        identity_map = _current_map.get()
+    if identity_map is None:
+        identity_map = EntityIdentityMap()
+    token = _current_map.set(identity_map)
+    try:
+        yield identity_map
+    finally:
+        _current_map.reset(token)
+        logger.debug('Entity cache: %s', identity_map.stats)
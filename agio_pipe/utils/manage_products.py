@@ -1,4 +1,5 @@
 import os
+from functools import partial
 from pathlib import Path
 
 import yaml
@@ -8,7 +9,9 @@ from agio.core.entities.product import AProduct
 from agio.core.entities.product_type import AProductType
 from agio.core.entities.task import ATask
 from agio_pipe.publish.instance import PublishInstance
-from .template_solver import TemplateSolver
+from .entity_cache import get_entity
+from .template_registry import get_template_solver
+from .template_solver import LazyEntity
 
 
 def create_product_from_template(
@@ -41,7 +44,9 @@ def create_product_from_template(
         raise ValueError('publish_dir_template must be specified')
     context = context or {}
     # solve product name
-    templates = _load_templates(entity.project)
+    project = entity.project
+    solver = get_template_solver(project.get_settings())
+    templates = solver.templates
     for t_name in (
             product_template['product_name_template'],
             product_template['publish_file_template'],
@@ -49,17 +54,17 @@ def create_product_from_template(
         ):
         if t_name not in templates:
             raise ValueError(f'template name {t_name} not found in project settings')
-    product_type = AProductType(product_template['product_type_id'])
+    product_type_id = product_template['product_type_id']
+    # entities are loaded only if templates use them
     render_context = {
         'entity': entity,
-        'project': entity.project,
-        'product_type': product_type,
+        'project': project,
+        'product_type': LazyEntity(partial(get_entity, AProductType), product_type_id),
         **(context or {})
     }
 
     if task:
-        render_context['task'] = task
-    solver = TemplateSolver(templates)
+        render_context['task'] = LazyEntity(partial(get_entity, ATask), task) if isinstance(task, str) else task
 
     # product name
     product_name_template_name = product_template['product_name_template']
@@ -110,19 +115,13 @@ def create_product_from_template(
     product = AProduct.create(
         entity_id=entity.id,
         name=product_name,
-        product_type_id=product_type.id,
+        product_type_id=product_type_id,
         variant=variant,
         fields=fields,
     )
     return product
 
 
-def _load_templates(project):
-    project_settings = project.get_settings()
-    templates = project_settings.get('agio_pipe.publish_templates', [])
-    return {template.name: template.pattern for template in templates}
-
-
 def get_product_templates(project)->dict|None:
     # TODO: load from settings
     templates_path = os.getenv('AGIO_PRODUCT_TEMPLATES_PATH')
@@ -0,0 +1,275 @@
+"""
+Reverse template parsing: path -> context variables
+
+Compiled template is converted to an anchored regular expression:
+    {version:04d}        -> digits, converted to int
+    {date:%Y-%m-%d}      -> strftime directives, converted to datetime
+    {value:.2f}          -> number, converted to float
+    (_{entity.variant})  -> optional group
+    {name}, {name:lower} -> any text without slashes
+
+Variables never match slashes, root path variables are set by known values
+(or any custom regex) by variable expression, otherwise the same path could be split
+in more than one way.
+
+Example:
+    parser = TemplateParser(solver.compile('publish_dir'),
+                            {'root.projects': known_values_pattern(['/mnt/projects', 'P:/projects'])})
+    parser.parse('/mnt/projects/proj/sh010/v003')
+    {'root': {'projects': '/mnt/projects'}, 'project': {'name': 'proj'}, 'entity': {'name': 'sh010'}, 'version': 3}
+"""
+from __future__ import annotations
+
+import os
+import re
+from datetime import datetime
+from typing import Any, Callable, Generator, Iterable
+
+from .template_solver import (
+    CompiledTemplate,
+    ExternalSegment,
+    LiteralSegment,
+    OptionalSegment,
+    VariableReference,
+    VariableSegment,
+    _format_functions,
+    fix_slashes,
+)
+
+_int_spec = re.compile(r"^(.?[<>=^])?[+\- ]?#?0?\d*[,_]?[bdoxXn]$")
+_float_spec = re.compile(r"^(.?[<>=^])?[+\- ]?#?0?\d*[,_]?(\.\d+)?[eEfFgG%]$")
+_strftime_directive = re.compile(r"%(.)")
+
+_strftime_patterns = {
+    'Y': r"\d{4}",
+    'y': r"\d{2}",
+    'm': r"\d{1,2}",
+    'd': r"\d{1,2}",
+    'H': r"\d{1,2}",
+    'I': r"\d{1,2}",
+    'M': r"\d{1,2}",
+    'S': r"\d{1,2}",
+    'f': r"\d{1,6}",
+    'j': r"\d{1,3}",
+    'U': r"\d{1,2}",
+    'W': r"\d{1,2}",
+    'w': r"\d",
+    'a': r"[^\W\d_]+",
+    'A': r"[^\W\d_]+",
+    'b': r"[^\W\d_]+",
+    'B': r"[^\W\d_]+",
+    'p': r"[^\W\d_]+",
+    '%': r"%",
+}
+
+ANY_PATTERN = r".+?"
+NAME_PATTERN = r"[^/\\]+?"
+INT_PATTERN = r"[+\-]?\d+"
+FLOAT_PATTERN = r"[+\-]?\d+(?:\.\d+)?(?:[eE][+\-]?\d+)?%?"
+
+
+def known_values_pattern(values: Iterable[str]) -> str:
+    """
+    Regex matching one of the values, e.g. project roots of all platforms
+    """
+    values = sorted({fix_slashes(value) for value in values}, key=len, reverse=True)
+    return '|'.join(re.escape(value) for value in values)
+
+
+def _strftime_to_regex(spec: str) -> str:
+    result = []
+    position = 0
+    for match in _strftime_directive.finditer(spec):
+        result.append(re.escape(spec[position:match.start()]))
+        result.append(_strftime_patterns.get(match.group(1), ANY_PATTERN))
+        position = match.end()
+    result.append(re.escape(spec[position:]))
+    return ''.join(result)
+
+
+def _to_float(value: str) -> float:
+    if value.endswith('%'):
+        return float(value[:-1]) / 100
+    return float(value)
+
+
+def _variable_pattern(variable: VariableReference, default: str) -> tuple[str, Callable[[str], Any] | None]:
+    """
+    Get regex and value converter from the last non-function format of the variable
+    """
+    specs = [frmt for frmt in variable.formats if frmt not in _format_functions]
+    if not specs:
+        return default, None
+    spec = specs[-1]
+    if _strftime_directive.search(spec):
+        return _strftime_to_regex(spec), lambda value: datetime.strptime(value, spec)
+    if _int_spec.match(spec):
+        if spec[-1] in 'bdn':
+            base = 2 if spec[-1] == 'b' else 10
+            return (r"[01]+" if base == 2 else INT_PATTERN), lambda value: int(value, base)
+        if spec[-1] in 'xX':
+            return r"[0-9a-fA-F]+", lambda value: int(value, 16)
+        return r"[0-7]+", lambda value: int(value, 8)
+    if _float_spec.match(spec):
+        return FLOAT_PATTERN, _to_float
+    return default, None
+
+
+class TemplateParser:
+    """
+    Extract context variables from the path using compiled template
+    """
+    def __init__(self, template: CompiledTemplate, patterns: dict[str, str] = None):
+        self.template = template
+        self.patterns = patterns or {}
+        pattern, self._groups = self.build_pattern()
+        self.regex = re.compile(pattern)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.template.name or self.template.pattern!r}>'
+
+    def build_pattern(self, prefix: str = '') -> tuple[str, dict[str, tuple[VariableReference, Callable | None]]]:
+        """
+        Build regular expression without anchors.
+        Group names are prefixed to combine patterns of many templates.
+        """
+        parts = []
+        groups = {}
+        segments = self.template.segments
+        # repeated variable must have the same value: value is captured by the first
+        # required occurrence and compared by the next ones, optional occurrences
+        # before it are not captured as the group may not take part in the match
+        first_required = {}
+        for index, segment in enumerate(segments):
+            if isinstance(segment, VariableSegment) and not isinstance(segment, OptionalSegment):
+                first_required.setdefault((segment.variable.expression, segment.variable.formats), index)
+        known = {}
+        skip_slash = False
+        for index, segment in enumerate(segments):
+            if isinstance(segment, LiteralSegment):
+                text = fix_slashes(segment.raw_value)
+                if skip_slash:
+                    text = text[1:]
+                    skip_slash = False
+                parts.append(re.escape(text))
+                continue
+            if isinstance(segment, ExternalSegment):
+                parts.append(ANY_PATTERN)
+                continue
+            variable = segment.variable
+            key = (variable.expression, variable.formats)
+            pattern, converter = _variable_pattern(variable, NAME_PATTERN)
+            pattern = self.patterns.get(variable.expression, pattern)
+            if key in known:
+                group = f'(?P={known[key]})'
+            elif first_required.get(key, index) != index:
+                group = f'(?:{pattern})'
+            else:
+                group_name = f'{prefix}v{len(groups)}'
+                group = f'(?P<{group_name}>{pattern})'
+                groups[group_name] = (variable, converter)
+                if key in first_required:
+                    known[key] = group_name
+            if isinstance(segment, OptionalSegment):
+                after = segment.after
+                # "a/(_{x})/b" is solved as "a/b" if x is empty
+                if (0 < index < len(segments) - 1
+                        and segments[index - 1].raw_value.endswith('/')
+                        and segments[index + 1].raw_value.startswith('/')
+                        and isinstance(segments[index + 1], LiteralSegment)):
+                    after += '/'
+                    skip_slash = True
+                parts.append(f'(?:{re.escape(segment.before)}{group}{re.escape(after)})?')
+            else:
+                parts.append(group)
+        return ''.join(parts), groups
+
+    def match(self, path: str | os.PathLike) -> re.Match | None:
+        return self.regex.fullmatch(fix_slashes(os.fspath(path)))
+
+    def parse(self, path: str | os.PathLike) -> dict | None:
+        """
+        Get nested context dict from the path or None if path does not match the template
+        """
+        match = self.match(path)
+        if match is None:
+            return None
+        return self.values_from_match(match)
+
+    def values_from_match(self, match: re.Match) -> dict:
+        return _collect_values(match, self._groups)
+
+
+def _collect_values(match: re.Match, groups: dict[str, tuple[VariableReference, Callable | None]]) -> dict:
+    result = {}
+    flat = {}
+    dynamic = []
+    for group_name, (variable, converter) in groups.items():
+        value = match.group(group_name)
+        if value is None:
+            continue
+        if converter is not None:
+            try:
+                value = converter(value)
+            except ValueError:
+                pass
+        if variable.key_variable is not None:
+            dynamic.append((variable, value))
+            continue
+        flat[variable.names] = value
+        _set_nested(result, variable.names, value)
+    # {steps[step_name]}: key is a value of other variable
+    for variable, value in dynamic:
+        key = flat.get(variable.key_variable.names)
+        if key is not None:
+            _set_nested(result, variable.names + (key,), value)
+    return result
+
+
+def _set_nested(data: dict, names: tuple[str, ...], value: Any) -> None:
+    for name in names[:-1]:
+        data = data.setdefault(name, {})
+        if not isinstance(data, dict):
+            return
+    data[names[-1]] = value
+
+
+class TemplateClassifier:
+    """
+    Match paths against many templates in one pass.
+    Templates with more literal text are checked first.
+    """
+    def __init__(self, parsers: dict[str, TemplateParser]):
+        self.parsers = dict(sorted(
+            parsers.items(),
+            key=lambda item: -sum(
+                len(segment.raw_value) for segment in item[1].template.segments
+                if isinstance(segment, LiteralSegment)
+            ),
+        ))
+        self._names = {}
+        self._groups = {}
+        alternatives = []
+        for index, (name, parser) in enumerate(self.parsers.items()):
+            prefix = f't{index}_'
+            pattern, groups = parser.build_pattern(prefix)
+            alternatives.append(f'(?P<t{index}>{pattern})')
+            self._names[f't{index}'] = name
+            self._groups[f't{index}'] = groups
+        self.regex = re.compile('|'.join(alternatives))
+
+    def classify(self, path: str | os.PathLike) -> tuple[str, dict] | tuple[None, None]:
+        """
+        Get matched template name and context values
+        """
+        match = self.regex.fullmatch(fix_slashes(os.fspath(path)))
+        if match is None:
+            return None, None
+        # the outer template group is closed last
+        key = match.lastgroup
+        return self._names[key], _collect_values(match, self._groups[key])
+
+    def classify_many(self, paths: Iterable[str | os.PathLike]
+                      ) -> Generator[tuple[str | os.PathLike, str | None, dict | None], None, None]:
+        for path in paths:
+            yield path, *self.classify(path)
@@ -0,0 +1,122 @@
+"""
+Process-wide registry of compiled path templates.
+
+Templates from workspace settings ("agio_pipe.publish_templates" and
+"agio_pipe.publication_name_template") are compiled once per settings revision
+and the same solver is shared by all publish entry points.
+Settings object is bound to one workspace revision, so its solver is looked up
+by the object without reading templates again.
+Shared solver must not be modified with add_template.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+
+from .template_solver import TemplateSolver
+
+logger = logging.getLogger(__name__)
+
+PUBLICATION_NAME_TEMPLATE = 'publication_name_template'
+
+
+def load_templates(settings) -> dict[str, str]:
+    """
+    Read template patterns from workspace settings
+    """
+    templates = {
+        template.name: template.path
+        for template in settings.get('agio_pipe.publish_templates', None) or []
+    }
+    publication_name_template = settings.get('agio_pipe.publication_name_template', None)
+    if publication_name_template:
+        templates[PUBLICATION_NAME_TEMPLATE] = publication_name_template
+    return templates
+
+
+def get_revision_key(templates: dict[str, str]) -> str:
+    """
+    Settings revision fingerprint of the template set
+    """
+    data = json.dumps(templates, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+class TemplateRegistry:
+    # keep solvers of few last revisions (different projects or settings update)
+    max_revisions = 8
+
+    def __init__(self):
+        self._solvers: OrderedDict[str, TemplateSolver] = OrderedDict()
+        # id(settings) -> (settings weakref, revision key)
+        self._settings_revisions: dict[int, tuple[weakref.ref, str]] = {}
+        self._lock = threading.Lock()
+
+    def get_solver(self, settings) -> TemplateSolver:
+        """
+        Get shared solver with compiled templates for the settings revision.
+        Templates are read from settings only for new settings objects.
+        """
+        with self._lock:
+            revision = self._get_settings_revision(settings)
+            solver = self._solvers.get(revision) if revision else None
+            if solver is not None:
+                self._solvers.move_to_end(revision)
+                return solver
+        templates = load_templates(settings)
+        revision = get_revision_key(templates)
+        with self._lock:
+            solver = self._solvers.get(revision)
+        if solver is None:
+            solver = self.create_solver(templates)
+        with self._lock:
+            solver = self._solvers.setdefault(revision, solver)
+            self._solvers.move_to_end(revision)
+            while len(self._solvers) > self.max_revisions:
+                self._solvers.popitem(last=False)
+            self._set_settings_revision(settings, revision)
+        return solver
+
+    def _get_settings_revision(self, settings) -> str | None:
+        ref, revision = self._settings_revisions.get(id(settings), (None, None))
+        if ref is not None and ref() is settings:
+            return revision
+        return None
+
+    def _set_settings_revision(self, settings, revision: str) -> None:
+        key = id(settings)
+        try:
+            ref = weakref.ref(settings, lambda _: self._settings_revisions.pop(key, None))
+        except TypeError:
+            # settings object can not be referenced, templates are read on each call
+            return
+        self._settings_revisions[key] = (ref, revision)
+
+    @staticmethod
+    def create_solver(templates: dict[str, str]) -> TemplateSolver:
+        solver = TemplateSolver(templates)
+        # circular references raise error here
+        errors = solver.compile_all()
+        for template_name, error in errors.items():
+            logger.warning('Template "%s" is not valid: %s', template_name, error)
+        return solver
+
+    def clear(self) -> None:
+        with self._lock:
+            self._solvers.clear()
+            self._settings_revisions.clear()
+
+
+_registry = TemplateRegistry()
+
+
+def get_template_solver(settings) -> TemplateSolver:
+    return _registry.get_solver(settings)
+
+
+def get_registry() -> TemplateRegistry:
+    return _registry
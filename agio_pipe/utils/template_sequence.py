@@ -0,0 +1,150 @@
+"""
+Frame sequence rendering.
+
+Template is solved once with a placeholder instead of the frame number,
+result is a printf-style pattern and a frame range compatible with pyseq:
+    shot_v003.%04d.exr 1001-1240
+Concrete paths are generated only on iteration.
+"""
+from __future__ import annotations
+
+import re
+from typing import Generator, Iterable
+
+import pyseq
+
+from .template_solver import CompiledTemplate
+
+_frame_marker = '\x00#\x00'
+_frame_spec = re.compile(r"^0?\d*d?$")
+
+
+class _FramePlaceholder:
+    """
+    Frame value stand-in, keeps format specs requested by the template
+    """
+    def __init__(self):
+        self.specs = []
+
+    def __format__(self, spec: str) -> str:
+        self.specs.append(spec)
+        return _frame_marker
+
+    def __str__(self):
+        self.specs.append('')
+        return _frame_marker
+
+    def __bool__(self):
+        return True
+
+
+def _compress_frames(frames: Iterable[int]) -> str:
+    """
+    1001-1100,1105,1110-1120
+    """
+    ranges = []
+    start = end = None
+    for frame in frames:
+        if start is None:
+            start = end = frame
+        elif frame == end + 1:
+            end = frame
+        else:
+            ranges.append((start, end))
+            start = end = frame
+    if start is not None:
+        ranges.append((start, end))
+    return ','.join(str(a) if a == b else f'{a}-{b}' for a, b in ranges)
+
+
+class TemplateSequence:
+    """
+    Solved template with frame placeholder and frame list
+    """
+    def __init__(self, parts: list[str], spec: str, frames: Iterable[int]):
+        self.parts = tuple(parts)
+        self.spec = spec
+        if isinstance(frames, range) and frames.step == 1:
+            self.frames = frames
+        else:
+            self.frames = tuple(sorted(set(frames)))
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self}>'
+
+    def __str__(self):
+        return f'{self.pattern} {self.frame_range}'
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __iter__(self) -> Generator[str, None, None]:
+        for frame in self.frames:
+            yield self.path(frame)
+
+    def __contains__(self, frame: int):
+        return frame in self.frames
+
+    @property
+    def padding(self) -> str:
+        """printf-style frame padding: %04d"""
+        return f"%{self.spec.rstrip('d')}d"
+
+    @property
+    def pattern(self) -> str:
+        return self.padding.join(self.parts)
+
+    @property
+    def head(self) -> str:
+        return self.parts[0]
+
+    @property
+    def tail(self) -> str:
+        return self.parts[-1]
+
+    @property
+    def start(self) -> int | None:
+        return self.frames[0] if self.frames else None
+
+    @property
+    def end(self) -> int | None:
+        return self.frames[-1] if self.frames else None
+
+    @property
+    def frame_range(self) -> str:
+        if isinstance(self.frames, range):
+            if not self.frames:
+                return ''
+            return f'{self.start}-{self.end}' if self.start != self.end else str(self.start)
+        return _compress_frames(self.frames)
+
+    def path(self, frame: int) -> str:
+        return format(frame, self.spec).join(self.parts)
+
+    def to_pyseq(self) -> pyseq.Sequence:
+        """
+        Expand paths to pyseq.Sequence
+        """
+        if len(self.parts) != 2:
+            raise ValueError(f'Sequence must contain exactly one frame number: {self.pattern}')
+        if not self.frames:
+            raise ValueError('Sequence has no frames')
+        return pyseq.Sequence(list(self))
+
+
+def solve_sequence(template: CompiledTemplate, context: dict, frames: Iterable[int],
+                   frame_variable: str = 'frame', **kwargs) -> TemplateSequence:
+    """
+    Solve frame-independent part of the template once
+    """
+    placeholder = _FramePlaceholder()
+    path = template.solve({**context, frame_variable: placeholder}, **kwargs)
+    if not placeholder.specs:
+        raise ValueError(f'Template {template.name or template.pattern!r} does not use "{frame_variable}" variable')
+    specs = set(placeholder.specs)
+    if len(specs) > 1:
+        raise ValueError(f'Different frame formats in template: {", ".join(sorted(specs))}')
+    spec = specs.pop()
+    if not _frame_spec.match(spec):
+        raise ValueError(f'Frame format is not supported for sequences: {spec!r}')
+    return TemplateSequence(path.split(_frame_marker), spec, frames)
@@ -9,11 +9,26 @@ Tokens:
 {my_obj[key]} - access to object attribute using attribute name from context
 {project.name:lower:strip} - apply formatting functions to variable value
 
+Context values can be lazy: LazyValue(callable) or LazyEntity(entity_class, entity_id)
+are resolved only if the template uses them.
+
 Example:
 "<roots.main>/{project.name}/{entity.name}/({entity.variant})/publish/v{version:04d}"
+
+Templates are compiled once into a CompiledTemplate: a flat, immutable program of
+literal and variable segments with all <external> references inlined.
 """
+from __future__ import annotations
+
 import re
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from functools import lru_cache
+from operator import itemgetter
 from datetime import datetime
+from typing import Any, Callable, Generator, Iterable
+
 from agio.tools import extract_variable
 
 class PathtemplateError(Exception):
@@ -35,6 +50,10 @@ class IncorrectTemplateError(PathTokenizerError):
     pass
 
 
+class TemplateCycleError(IncorrectTemplateError):
+    pass
+
+
 class TemplateNotFoundError(PathtemplateError):
     pass
 
@@ -48,6 +67,170 @@ _format_functions = {
     'lstrip': str.lstrip,
 }
 
+_variable_parts_pattern = re.compile(
+    r"\{"
+    r"(?P<name>[\w\d._]+)"  # variable name
+    r"(?P<attr>\[[\w._'\"]+])?" # variable attribute name
+    r":?(?P<formats>.*?)?"  # formatting
+    r"}",
+    re.VERBOSE)
+
+_optional_parts_pattern = re.compile(
+    r"\("                   # opening optional parenthesis
+    r"(?P<strong>!?)"       # strong or not: mark "!"
+    r"(?P<before>.*?)"      # text before variable
+    r"(?P<value>\{.*?})"    # variable
+    r"(?P<after>.*?)"       # text after variable
+    r"\)",                  # closing optional parenthesis
+    re.VERBOSE)
+
+_external_name_pattern = re.compile(r"<([\w_\-]+)>")
+_quoted_key_pattern = re.compile(r"^([\"'].*?[\"'])$")
+_key_variable_pattern = re.compile(r"^[\w._]+$")
+_multiple_slashes = re.compile(r"//+")
+_multiple_backslashes = re.compile(r"\\\\+")
+_missing = object()
+
+
+def _apply_formatting(value, formats: list|tuple|str):
+    if not formats:
+        return value
+    if isinstance(formats, str):
+        formats = formats.split(':')
+    for frmt in formats:
+        if frmt in _format_functions:
+            value = _format_functions[frmt](str(value))
+        else:
+            value = f"{value:{frmt}}"
+    return value
+
+
+def fix_slashes(path: str) -> str:
+    """Collapse repeated slashes and backslashes"""
+    if '//' in path:
+        path = _multiple_slashes.sub('/', path)
+    if '\\\\' in path:
+        path = _multiple_backslashes.sub(r"\\", path)
+    return path
+
+
+class LazyValue:
+    """
+    Context value provider called on first access, result is kept for next accesses
+    """
+    __slots__ = ('_provider', '_value', '_lock')
+
+    def __init__(self, provider: Callable[[], Any]):
+        self._provider = provider
+        self._value = _missing
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        state = repr(self._value) if self.is_resolved else 'not resolved'
+        return f'<{self.__class__.__name__} {state}>'
+
+    @property
+    def is_resolved(self) -> bool:
+        return self._value is not _missing
+
+    def get(self) -> Any:
+        if self._value is _missing:
+            with self._lock:
+                if self._value is _missing:
+                    self._value = self._provider()
+        return self._value
+
+
+class LazyEntity(LazyValue):
+    """
+    Deferred entity reference, entity is created on first access to its attributes.
+    Id is known without loading the entity.
+    """
+    __slots__ = ('entity_id',)
+
+    def __init__(self, factory: Callable[..., Any], entity_id: Any, **kwargs):
+        super().__init__(lambda: factory(entity_id, **kwargs))
+        self.entity_id = entity_id
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.entity_id}>'
+
+
+def get_context_value(names: list[str] | tuple[str, ...], context: dict) -> Any:
+    """
+    Get nested value from context resolving lazy values on the way
+    """
+    value = context
+    for name in names:
+        if isinstance(value, LazyValue):
+            if name == 'id' and isinstance(value, LazyEntity):
+                value = value.entity_id
+                continue
+            value = value.get()
+        value = extract_variable.get_nested_value([name], value)
+    if isinstance(value, LazyValue):
+        value = value.get()
+    return value
+
+
+def _make_getter(value_type: type, name: str) -> Callable[[Any], Any]:
+    """
+    Getter of one chain step for the value type
+    """
+    if issubclass(value_type, LazyValue):
+        if name == 'id' and issubclass(value_type, LazyEntity):
+            return lambda value: value.entity_id
+        return lambda value: _get_step(value.get(), name)
+    if issubclass(value_type, Mapping):
+        return itemgetter(name)
+    if issubclass(value_type, (list, tuple)):
+        return lambda value: extract_variable.get_nested_value([name], value)
+
+    def get_attribute(value):
+        try:
+            return getattr(value, name)
+        except AttributeError:
+            return extract_variable.get_nested_value([name], value)
+    return get_attribute
+
+
+def _get_step(value: Any, name: str) -> Any:
+    return _make_getter(type(value), name)(value)
+
+
+class _Accessor:
+    """
+    One step of the variable accessor chain, getters are cached per value type
+    """
+    __slots__ = ('name', '_getters')
+
+    def __init__(self, name: str):
+        self.name = name
+        self._getters: dict[type, Callable[[Any], Any]] = {}
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.name!r}>'
+
+    def __call__(self, value: Any) -> Any:
+        getter = self._getters.get(value.__class__)
+        if getter is None:
+            getter = self._getters[value.__class__] = _make_getter(value.__class__, self.name)
+        return getter(value)
+
+
+def _compile_formats(formats: tuple[str, ...]) -> tuple[Callable[[Any], Any], ...]:
+    """
+    Formatter pipeline: one callable per format of the chain
+    """
+    pipeline = []
+    for frmt in formats:
+        func = _format_functions.get(frmt)
+        if func is not None:
+            pipeline.append(lambda value, func=func: func(str(value)))
+        else:
+            pipeline.append(lambda value, spec=frmt: format(value, spec))
+    return tuple(pipeline)
+
 
 class TokenBase:
     name = None
@@ -75,9 +258,9 @@ class TokenBase:
         names_chain = variable_name.split('.')
         if attributes:
             attributes = attributes.strip('[]')
-            if re.match(r"^([\"'].*?[\"'])$", attributes):
+            if _quoted_key_pattern.match(attributes):
                 names_chain.append(attributes.strip('\'"'))
-            elif re.match(r"^[\w._]+$", attributes):
+            elif _key_variable_pattern.match(attributes):
                 attr_name = self.solve_variable(attributes, context)
                 names_chain.append(attr_name)
             else:
@@ -93,7 +276,7 @@ class TokenBase:
         Extract value fom context
         """
         try:
-            value = extract_variable.get_nested_value(names, context)
+            value = get_context_value(names, context)
         except (KeyError, AttributeError, IndexError) as e:
             if isinstance(names, list):
                 msg_name = '.'.join(names)
@@ -103,16 +286,7 @@ class TokenBase:
         return value
 
     def apply_formatting(self, value, formats: list|str, context: dict) -> str:
-        if not formats:
-            return value
-        if isinstance(formats, str):
-            formats = formats.split(':')
-        for frmt in formats:
-            if frmt in _format_functions:
-                value = _format_functions[frmt](str(value))
-            else:
-                value = f"{value:{frmt}}"
-        return value
+        return _apply_formatting(value, formats)
 
 
 class TokenRegular(TokenBase):
@@ -123,25 +297,16 @@ class TokenRegular(TokenBase):
         re.VERBOSE)
 
     def extract_parts(self, value: str):
-        parts = re.search(
-            r"\{"
-            r"(?P<name>[\w\d._]+)"  # variable name
-            r"(?P<attr>\[[\w._'\"]+])?" # variable attribute name
-            r":?(?P<formats>.*?)?"  # formatting
-            r"}",
-            value, re.VERBOSE)
+        parts = _variable_parts_pattern.search(value)
         if not parts:
             raise IncorrectTemplateError
         return parts.groupdict()
 
     def solve(self, context: dict, **kwargs):
-        parts = self.extract_parts(self.value)
-        return self.solve_variable(
-            parts["name"],
-            context,
-            parts['attr'],
-            parts["formats"]
-        )
+        return self.solve_value(self.value, context)
+
+    def solve_value(self, value: str, context: dict):
+        return _parse_variable(value).resolve(context)
 
 
 class TokenOptional(TokenRegular):
@@ -155,21 +320,13 @@ class TokenOptional(TokenRegular):
     )
 
     def solve(self, context: dict, **kwargs):
-        match = re.match(
-            r"\("                   # opening optional parenthesis 
-            r"(?P<strong>!?)"       # strong or not: mark "!"
-            r"(?P<before>.*?)"      # text before variable
-            r"(?P<value>\{.*?})"    # variable
-            r"(?P<after>.*?)"       # text after variable
-            r"\)",                  # closing optional parenthesis
-            self.value, re.VERBOSE)
+        match = _optional_parts_pattern.match(self.value)
         if not match:
             raise IncorrectTemplateError
         parts = match.groupdict()
         skip_empty_values = not parts.get('strong').strip()
-        self.value = parts['value']
         try:
-            result = super().solve(context)
+            result = self.solve_value(parts['value'], context)
         except VariableNotFoundError:
             if kwargs.get('skip_empty_values', False):
                 raise
@@ -190,60 +347,576 @@ class TokenExternal(TokenBase):
     )
 
     def solve(self, context: dict):
-        match = re.match(r"<([\w_\-]+)>", self.value)
+        match = _external_name_pattern.match(self.value)
         if match:
             return match.group(1)
         raise IncorrectTemplateError
 
 
+@dataclass(frozen=True, slots=True)
+class VariableReference:
+    """
+    Parsed variable expression {name[attr]:format:format}
+    """
+    expression: str
+    names: tuple[str, ...]
+    key_variable: VariableReference | None = None
+    formats: tuple[str, ...] = ()
+    accessors: tuple[_Accessor, ...] = field(init=False, repr=False, compare=False)
+    formatters: tuple[Callable[[Any], Any], ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'accessors', tuple(_Accessor(name) for name in self.names))
+        object.__setattr__(self, 'formatters', _compile_formats(self.formats))
+
+    @classmethod
+    def parse(cls, raw_value: str) -> VariableReference:
+        parts = _variable_parts_pattern.search(raw_value)
+        if not parts:
+            raise IncorrectTemplateError(f'Incorrect variable: {raw_value}')
+        return cls.from_parts(parts['name'], parts['attr'], parts['formats'])
+
+    @classmethod
+    def from_parts(cls, name: str, attributes: str = None, formats: str = None) -> VariableReference:
+        names = tuple(name.split('.'))
+        key_variable = None
+        if attributes:
+            key = attributes.strip('[]')
+            if _quoted_key_pattern.match(key):
+                names += (key.strip('\'"'),)
+            elif _key_variable_pattern.match(key):
+                key_variable = cls.from_parts(key)
+            else:
+                raise IncorrectTemplateError(f'Incorrect attribute name: {attributes}')
+        return cls(
+            expression=f'{name}{attributes or ""}',
+            names=names,
+            key_variable=key_variable,
+            formats=tuple(formats.split(':')) if formats else (),
+        )
+
+    @property
+    def name(self) -> str:
+        return self.names[0]
+
+    @property
+    def roots(self) -> tuple[str, ...]:
+        """Top level context keys used by this variable"""
+        if self.key_variable is None:
+            return self.names[:1]
+        return self.names[:1] + self.key_variable.roots
+
+    def resolve(self, context: dict) -> Any:
+        key = _missing
+        if self.key_variable is not None:
+            key = self.key_variable.resolve(context)
+        try:
+            value = context
+            for accessor in self.accessors:
+                value = accessor(value)
+            if key is not _missing:
+                value = _get_step(value, key)
+            if isinstance(value, LazyValue):
+                value = value.get()
+        except (KeyError, AttributeError, IndexError) as e:
+            names = self.names if key is _missing else self.names + (key,)
+            raise VariableNotFoundError(f"Variable not found: {'.'.join(map(str, names))}") from e
+        if not value:
+            raise EmptyValueError(f'Variable {self.expression!r} is empty')
+        for formatter in self.formatters:
+            value = formatter(value)
+        return value
+
+
+@lru_cache(maxsize=1024)
+def _parse_variable(raw_value: str) -> VariableReference:
+    """Parsed variable with compiled accessors, shared by tokens with the same expression"""
+    return VariableReference.parse(raw_value)
+
+
+class TemplateSegment:
+    """
+    Base class of compiled template program item
+    """
+    __slots__ = ()
+    raw_value: str
+
+    @property
+    def roots(self) -> tuple[str, ...] | None:
+        """Context keys the result depends on, None for constant text"""
+        return ()
+
+    def render(self, context: dict, keep_missing: bool = False, keep_optional: bool = True) -> str:
+        raise NotImplementedError
+
+
+@dataclass(frozen=True, slots=True)
+class LiteralSegment(TemplateSegment):
+    raw_value: str
+
+    @property
+    def roots(self) -> None:
+        return None
+
+    def render(self, context: dict, keep_missing: bool = False, keep_optional: bool = True) -> str:
+        return self.raw_value
+
+
+@dataclass(frozen=True, slots=True)
+class VariableSegment(TemplateSegment):
+    raw_value: str
+    variable: VariableReference
+
+    @property
+    def roots(self) -> tuple[str, ...]:
+        return self.variable.roots
+
+    def render(self, context: dict, keep_missing: bool = False, keep_optional: bool = True) -> str:
+        try:
+            return str(self.variable.resolve(context))
+        except (VariableNotFoundError, EmptyValueError):
+            if keep_missing:
+                return self.raw_value
+            raise
+
+
+@dataclass(frozen=True, slots=True)
+class OptionalSegment(TemplateSegment):
+    raw_value: str
+    variable: VariableReference
+    before: str = ''
+    after: str = ''
+    strong: bool = False
+
+    @property
+    def roots(self) -> tuple[str, ...]:
+        return self.variable.roots
+
+    def render(self, context: dict, keep_missing: bool = False, keep_optional: bool = True) -> str:
+        try:
+            value = self.variable.resolve(context)
+        except VariableNotFoundError:
+            if keep_missing and keep_optional:
+                return self.raw_value
+            return ''
+        except EmptyValueError:
+            if not self.strong:
+                return ''
+            if keep_missing:
+                return self.raw_value if keep_optional else ''
+            raise
+        return f'{self.before}{value}{self.after}'
+
+
+@dataclass(frozen=True, slots=True)
+class ExternalSegment(TemplateSegment):
+    """
+    Reference to the template which was not found on compile
+    """
+    raw_value: str
+    template_name: str
+
+    def render(self, context: dict, keep_missing: bool = False, keep_optional: bool = True) -> str:
+        if keep_missing:
+            return self.raw_value
+        raise TemplateNotFoundError(f"Template '{self.template_name}' not found")
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledTemplate:
+    """
+    Immutable template program, can be kept and solved without the solver
+    """
+    name: str | None
+    segments: tuple[TemplateSegment, ...]
+    # names of inlined external templates
+    references: tuple[str, ...] = ()
+
+    @property
+    def pattern(self) -> str:
+        """Template string with expanded external templates"""
+        return ''.join(segment.raw_value for segment in self.segments)
+
+    def solve(self, context: dict, keep_missing: bool = False, keep_optional: bool = True,
+              no_fix_slashes: bool = False, **kwargs) -> str:
+        result = ''.join([segment.render(context, keep_missing, keep_optional) for segment in self.segments])
+        if no_fix_slashes:
+            return result
+        return fix_slashes(result)
+
+    def solve_partial(self, context: dict, keep_optional: bool = True, **kwargs) -> str:
+        return self.solve(context, keep_missing=True, keep_optional=keep_optional, **kwargs)
+
+    def iter_solve(self, contexts: Iterable[dict], keep_missing: bool = False, keep_optional: bool = True,
+                   no_fix_slashes: bool = False, **kwargs) -> Generator[str, None, None]:
+        """
+        Solve template for each context.
+        Segment is evaluated again only if any of its top level context values
+        is not the same object as in the previous context, so values shared by
+        all contexts (project, entity, task...) are resolved once.
+        Shared objects must not be modified while iterating.
+        """
+        parts = [segment.raw_value for segment in self.segments]
+        # segments to render for the first context only
+        pending = [index for index, segment in enumerate(self.segments) if segment.roots is not None]
+        # context key -> indexes of segments depending on it
+        dependents: dict[str, list[int]] = {}
+        for index in pending:
+            for root in self.segments[index].roots:
+                dependents.setdefault(root, []).append(index)
+        dependents_list = list(dependents.items())
+        last_values = {root: _missing for root in dependents}
+        for context in contexts:
+            for root, indexes in dependents_list:
+                value = context.get(root, _missing)
+                if value is not last_values[root]:
+                    last_values[root] = value
+                    pending.extend(indexes)
+            if pending:
+                for index in set(pending):
+                    parts[index] = self.segments[index].render(context, keep_missing, keep_optional)
+                pending.clear()
+            result = ''.join(parts)
+            yield result if no_fix_slashes else fix_slashes(result)
+
+    def solve_many(self, contexts: Iterable[dict], **kwargs) -> list[str]:
+        return list(self.iter_solve(contexts, **kwargs))
+
+
+@dataclass(frozen=True, slots=True)
+class TemplateVariable:
+    expression: str
+    names: tuple[str, ...]
+    formats: tuple[str, ...]
+    required: bool
+
+
+@dataclass(frozen=True, slots=True)
+class TemplateInfo:
+    """
+    Result of the static template analysis
+    """
+    name: str | None
+    variables: tuple[TemplateVariable, ...]
+    # inlined external templates
+    references: tuple[str, ...]
+    # external templates not found on compile
+    missing_references: tuple[str, ...]
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        return tuple(var.expression for var in self.variables)
+
+    @property
+    def required(self) -> tuple[str, ...]:
+        return tuple(var.expression for var in self.variables if var.required)
+
+    @property
+    def optional(self) -> tuple[str, ...]:
+        return tuple(var.expression for var in self.variables if not var.required)
+
+    @property
+    def roots(self) -> tuple[str, ...]:
+        """Top level context keys"""
+        return tuple(dict.fromkeys(var.names[0] for var in self.variables))
+
+    @property
+    def attribute_chains(self) -> dict[str, tuple[str, ...]]:
+        return {var.expression: var.names for var in self.variables}
+
+    @property
+    def formats(self) -> dict[str, tuple[str, ...]]:
+        return {var.expression: var.formats for var in self.variables if var.formats}
+
+
+def analyze_template(template: CompiledTemplate) -> TemplateInfo:
+    """
+    Collect variables of the compiled template without solving it.
+    Variable is required if it is used at least once outside of optional group.
+    """
+    variables: dict[str, dict] = {}
+
+    def add(variable: VariableReference, required: bool):
+        info = variables.setdefault(variable.expression, {
+            'names': variable.names,
+            'formats': variable.formats,
+            'required': required,
+        })
+        info['required'] = info['required'] or required
+        if not info['formats']:
+            info['formats'] = variable.formats
+        if variable.key_variable is not None:
+            add(variable.key_variable, required)
+
+    missing = []
+    for segment in template.segments:
+        if isinstance(segment, VariableSegment):
+            add(segment.variable, True)
+        elif isinstance(segment, OptionalSegment):
+            add(segment.variable, False)
+        elif isinstance(segment, ExternalSegment):
+            missing.append(segment.template_name)
+    return TemplateInfo(
+        name=template.name,
+        variables=tuple(TemplateVariable(expression, **info) for expression, info in variables.items()),
+        references=template.references,
+        missing_references=tuple(dict.fromkeys(missing)),
+    )
+
+
+_segment_pattern = re.compile(
+    r"(?P<optional>" + TokenOptional.pattern.pattern + r")"
+    r"|(?P<regular>" + TokenRegular.pattern.pattern + r")",
+    re.VERBOSE)
+
+
+def parse_segments(template: str) -> list[TemplateSegment]:
+    """
+    Split template string without external references to segments
+    """
+    segments = []
+    position = 0
+    for match in _segment_pattern.finditer(template):
+        if match.start() > position:
+            segments.append(LiteralSegment(template[position:match.start()]))
+        raw_value = match.group(0)
+        if match['optional']:
+            parts = _optional_parts_pattern.match(raw_value)
+            if not parts:
+                raise IncorrectTemplateError(f'Incorrect optional variable: {raw_value}')
+            segments.append(OptionalSegment(
+                raw_value=raw_value,
+                variable=VariableReference.parse(parts['value']),
+                before=parts['before'],
+                after=parts['after'],
+                strong=bool(parts['strong'].strip()),
+            ))
+        else:
+            segments.append(VariableSegment(raw_value, VariableReference.parse(raw_value)))
+        position = match.end()
+    if position < len(template):
+        segments.append(LiteralSegment(template[position:]))
+    return segments
+
+
+def _merge_literals(segments: list[TemplateSegment]) -> tuple[TemplateSegment, ...]:
+    merged = []
+    for segment in segments:
+        if isinstance(segment, LiteralSegment):
+            if merged and isinstance(merged[-1], LiteralSegment):
+                merged[-1] = LiteralSegment(merged[-1].raw_value + segment.raw_value)
+                continue
+        merged.append(segment)
+    return tuple(merged)
+
+
 class TemplateSolver:
+    """
+    Solver has no state changed by solving, one instance can be shared between threads.
+    Compiled templates are cached on first use.
+    """
     token_specs = {
         "external": TokenExternal,
         "optional": TokenOptional,
         "regular": TokenRegular,
     }
 
+    string_cache_size = 256
+
     def __init__(self, template_list: dict):
         self.templates = template_list
+        self._compiled: dict[str, CompiledTemplate] = {}
+        self._compiled_strings: dict[str, CompiledTemplate] = {}
+        self._parsers: dict[str, Any] = {}
+        self._classifiers: dict[tuple[str, ...], Any] = {}
+        self._parse_patterns: dict[str, str] = {}
+        self._analysis: dict[str, TemplateInfo] = {}
+        self._lock = threading.RLock()
 
     def add_template(self, name: str, pattern: str) -> None:
-        self.templates[name] = pattern
+        with self._lock:
+            self.templates[name] = pattern
+            # any compiled template can contain this one inlined
+            self.clear_cache()
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._compiled.clear()
+            self._compiled_strings.clear()
+            self._parsers.clear()
+            self._classifiers.clear()
+            self._analysis.clear()
+
+    def compile(self, template_name: str) -> CompiledTemplate:
+        """
+        Get compiled program of the template with inlined external templates
+        """
+        compiled = self._compiled.get(template_name)
+        if compiled is not None:
+            return compiled
+        with self._lock:
+            compiled = self._compiled.get(template_name)
+            if compiled is None:
+                template = self.templates.get(template_name)
+                if not template:
+                    raise TemplateNotFoundError(
+                        f"Template '{template_name}' not found: {', '.join(self.templates.keys())}")
+                compiled = self._compiled[template_name] = self._compile(template, template_name)
+            return compiled
+
+    def compile_string(self, template: str) -> CompiledTemplate:
+        """
+        Compile raw template string, external templates are taken from this solver
+        """
+        compiled = self._compiled_strings.get(template)
+        if compiled is not None:
+            return compiled
+        with self._lock:
+            compiled = self._compiled_strings.get(template)
+            if compiled is None:
+                if len(self._compiled_strings) >= self.string_cache_size:
+                    self._compiled_strings.clear()
+                compiled = self._compiled_strings[template] = self._compile(template)
+            return compiled
+
+    def compile_all(self) -> dict[str, Exception]:
+        """
+        Compile all templates.
+        Circular references raise error, other errors are returned by template name.
+        """
+        errors = {}
+        for template_name in list(self.templates):
+            try:
+                self.compile(template_name)
+            except TemplateCycleError:
+                raise
+            except PathtemplateError as e:
+                errors[template_name] = e
+        return errors
+
+    def _compile(self, template: str, template_name: str = None) -> CompiledTemplate:
+        references = []
+        stack = (template_name,) if template_name else ()
+        segments = self._compile_segments(template, stack, references)
+        return CompiledTemplate(
+            name=template_name,
+            segments=_merge_literals(segments),
+            references=tuple(dict.fromkeys(references)),
+        )
 
-    def solve(self, template_name: str, context: dict, **kwargs) -> str:
-        # get template
+    def _compile_segments(self, template: str, stack: tuple[str, ...], references: list[str]) -> list[TemplateSegment]:
+        segments = []
+        position = 0
+        for match in TokenExternal.pattern.finditer(template):
+            segments.extend(parse_segments(template[position:match.start()]))
+            segments.extend(self._compile_external(match.group(0), stack, references))
+            position = match.end()
+        segments.extend(parse_segments(template[position:]))
+        return segments
+
+    def _compile_external(self, raw_value: str, stack: tuple[str, ...], references: list[str]) -> list[TemplateSegment]:
+        match = _external_name_pattern.match(raw_value)
+        if not match:
+            raise IncorrectTemplateError(f'Incorrect external template name: {raw_value}')
+        template_name = match.group(1)
+        if template_name in stack:
+            raise TemplateCycleError(f"Circular template reference: {' -> '.join(stack + (template_name,))}")
         template = self.templates.get(template_name)
         if not template:
-            raise TemplateNotFoundError(f"Template '{template_name}' not found: {', '.join(self.templates.keys())}")
-        return self.solve_template_string(template, context, **kwargs)
+            # solved as error or kept as is in partial mode
+            return [ExternalSegment(raw_value, template_name)]
+        references.append(template_name)
+        return self._compile_segments(template, stack + (template_name,), references)
+
+    def solve(self, template_name: str, context: dict, **kwargs) -> str:
+        return self.compile(template_name).solve(context, **kwargs)
 
     def solve_template_string(self, template: str, context: dict, **kwargs) -> str:
-        # tokenize template
-        tokens, tmpl = self.tokenize_string(template)
-        for holder, token in tokens.items():
-            token: TokenBase
-            try:
-                if isinstance(token, TokenExternal):
-                    template_name = token.solve(context)
-                    value = self.solve(template_name, context, **kwargs)
-                else:
-                    if kwargs.get('keep_missing') and not (isinstance(token, TokenOptional) and not kwargs.get('keep_optional', True)):
-                        # force raise error for non exists variable to pass through raw value
-                        kwargs['skip_empty_values'] = True
-                    value = token.solve(context, **kwargs)
-            except (VariableNotFoundError, TemplateNotFoundError, EmptyValueError):
-                if kwargs.get('keep_missing', False):
-                    if not (isinstance(token, TokenOptional) and not kwargs.get('keep_optional', True)):
-                        value = token.raw_value
-                    else:
-                        # skip optional variable if value is not found
-                        value = ''
-                else:
-                    raise
-            tmpl = tmpl.replace(holder, str(value))
-        # fix slashes
-        if not kwargs.get('no_fix_slashes'): # disable removing multiple slashes
-            tmpl = re.sub(r"\\\\+", r"\\", re.sub(r"//+", r"/", tmpl))
-        return tmpl
+        return self.compile_string(template).solve(context, **kwargs)
+
+    def iter_solve(self, template_name: str, contexts: Iterable[dict], **kwargs) -> Generator[str, None, None]:
+        """
+        Solve one template for many contexts lazily
+        """
+        yield from self.compile(template_name).iter_solve(contexts, **kwargs)
+
+    def solve_many(self, template_name: str, contexts: Iterable[dict], **kwargs) -> list[str]:
+        """
+        Solve one template for many contexts.
+        Template is compiled once and variables with the same values in all contexts are solved once.
+        """
+        return self.compile(template_name).solve_many(contexts, **kwargs)
+
+    def solve_sequence(self, template_name: str, context: dict, frames: Iterable[int],
+                       frame_variable: str = 'frame', **kwargs):
+        """
+        Solve template once for a frame sequence.
+        Returns TemplateSequence with pyseq-like pattern and frame range, paths are expanded on iteration.
+        """
+        from .template_sequence import solve_sequence
+
+        return solve_sequence(self.compile(template_name), context, frames, frame_variable, **kwargs)
+
+    def set_parse_patterns(self, patterns: dict[str, str]) -> None:
+        """
+        Set default regex for variables by expression used by all parsers,
+        e.g. known project roots {'root.projects': known_values_pattern(roots)}
+        """
+        with self._lock:
+            self._parse_patterns = dict(patterns)
+            self._parsers.clear()
+            self._classifiers.clear()
+
+    def get_parser(self, template_name: str, patterns: dict[str, str] = None):
+        """
+        Get reverse parser of the template.
+        patterns: custom regex for variables by expression, e.g. {'root.projects': '.+'}
+        """
+        from .template_parser import TemplateParser
+
+        if patterns:
+            return TemplateParser(self.compile(template_name), {**self._parse_patterns, **patterns})
+        parser = self._parsers.get(template_name)
+        if parser is None:
+            with self._lock:
+                parser = self._parsers.get(template_name)
+                if parser is None:
+                    parser = self._parsers[template_name] = TemplateParser(
+                        self.compile(template_name), self._parse_patterns
+                    )
+        return parser
+
+    def parse(self, template_name: str, path: str, patterns: dict[str, str] = None) -> dict | None:
+        """
+        Extract context variables from the path.
+        Return None if path does not match the template.
+        """
+        return self.get_parser(template_name, patterns).parse(path)
+
+    def get_classifier(self, template_names: Iterable[str] = None):
+        """
+        Get classifier which matches paths against all (or selected) templates at once
+        """
+        from .template_parser import TemplateClassifier
+
+        key = tuple(template_names or self.templates.keys())
+        classifier = self._classifiers.get(key)
+        if classifier is None:
+            with self._lock:
+                classifier = self._classifiers.get(key)
+                if classifier is None:
+                    classifier = self._classifiers[key] = TemplateClassifier(
+                        {name: self.get_parser(name) for name in key}
+                    )
+        return classifier
+
+    def classify(self, paths: Iterable[str], template_names: Iterable[str] = None
+                 ) -> Generator[tuple[str, str | None, dict | None], None, None]:
+        """
+        Yield (path, template name, context variables) for each path.
+        Template name and variables are None for not matched paths.
+        """
+        yield from self.get_classifier(template_names).classify_many(paths)
 
     def solve_partial(self, template_name: str, context: dict, keep_optional=True, **kwargs) -> str:
         """
@@ -251,9 +924,7 @@ class TemplateSolver:
         Solve existing variables
         Keep missing variables
         """
-        kwargs['keep_missing'] = True
-        kwargs['keep_optional'] = keep_optional
-        return self.solve(template_name, context, **kwargs)
+        return self.solve(template_name, context, **{**kwargs, 'keep_missing': True, 'keep_optional': keep_optional})
 
     def tokenize_string(self, raw_template: str) -> tuple[dict, str]:
         raw_tokens = {}
@@ -275,10 +946,24 @@ class TemplateSolver:
                 break
         return raw_tokens, raw_template
 
+    def analyze(self, template_name: str) -> TemplateInfo:
+        """
+        Static analysis of the template: variables, formats and external templates
+        """
+        info = self._analysis.get(template_name)
+        if info is None:
+            info = self._analysis[template_name] = analyze_template(self.compile(template_name))
+        return info
+
     def get_variables(self, template_name: str, required_only=False, **kwargs) -> list[str]:
-        full_pattern = self.solve_partial(template_name, {}, **kwargs)
-        tokens = self.tokenize_string(full_pattern)[0]
-        return [token.value.strip('{}').split(':')[0] for token in tokens.values()]
+        """
+        Variable expressions used in template, without formatting.
+        Optional variables are skipped if required_only or keep_optional=False
+        """
+        info = self.analyze(template_name)
+        if required_only or not kwargs.get('keep_optional', True):
+            return list(info.required)
+        return list(info.names)
 
 
 if __name__ == '__main__':
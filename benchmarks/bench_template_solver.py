@@ -0,0 +1,252 @@
+"""
+Template solver benchmarks
+
+Usage:
+    python benchmarks/bench_template_solver.py                      # print results
+    python benchmarks/bench_template_solver.py --save baseline.json # store results
+    python benchmarks/bench_template_solver.py --compare benchmarks/baseline.json
+
+With --compare the script exits with code 1 if any benchmark is slower than
+baseline by more than --threshold times. Baselines marked as synthetic (like
+benchmarks/baseline.json, recorded without agio installed) are only printed
+for reference and never fail the run.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+from agio_pipe.utils.template_parser import known_values_pattern
+from agio_pipe.utils.template_solver import TemplateSolver
+
+TEMPLATES = {
+    'root_path': '{root.projects}',
+    'project_root': '<root_path>/{project.name:lower:strip}',
+    'entity_root': '<project_root>/{entity.parent.name}/{entity.name:lower}',
+    'publish_dir': '<entity_root>/{task.name}/publish/{product.name}(_{product.variant})/v{version:04d}',
+    'publish_file': '<publish_dir>/{entity.name}_{product.name}_v{version:04d}.{frame:04d}.{ext}',
+}
+
+# building blocks of generated template sets
+_VARIABLE_PARTS = [
+    '{entity.name}',
+    '{entity.name:lower}',
+    "{entity['code']}",
+    '{task.name:upper:strip}',
+    '(_{product.variant})',
+    '(!{product.variant})',
+    '(.{frame:04d})',
+    'v{version:04d}',
+    '{current_date:%Y-%m-%d}',
+    '{steps[step_name]}',
+    '{project.name:lower:strip}',
+]
+
+BENCHMARKS: dict[str, Callable[[argparse.Namespace], dict[str, float]]] = {}
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__.removeprefix('bench_')] = func
+    return func
+
+
+class Entity:
+    def __init__(self, name: str, parent: 'Entity' = None, code: str = None):
+        self.name = name
+        self.parent = parent
+        self.code = code or name
+
+    def __getitem__(self, item):
+        return getattr(self, item)
+
+
+def make_context(extra_keys: int = 0) -> dict:
+    context = {
+        'root': {'projects': '/mnt/projects'},
+        'project': {'name': 'Project '},
+        'entity': Entity('sh010', Entity('sq01')),
+        'task': {'name': ' lighting '},
+        'product': {'name': 'render', 'variant': 'main'},
+        'version': 3,
+        'frame': 1001,
+        'ext': 'exr',
+        'current_date': datetime(2024, 1, 1),
+        'step_name': 'light',
+        'steps': {'light': 'LGT', 'comp': 'CMP'},
+    }
+    for i in range(extra_keys):
+        context[f'extra_{i}'] = {'name': f'value_{i}'}
+    return context
+
+
+def make_templates(count: int, depth: int = 8, seed: int = 0) -> dict[str, str]:
+    """
+    Template set with <external> chains up to `depth` levels
+    """
+    rnd = random.Random(seed)
+    templates = {'t0': '{root.projects}'}
+    levels = {'t0': 0}
+    for i in range(1, count):
+        candidates = [name for name, level in levels.items() if level < depth]
+        parent = rnd.choice(candidates)
+        parts = rnd.sample(_VARIABLE_PARTS, 3)
+        templates[f't{i}'] = f"<{parent}>/{'/'.join(parts)}"
+        levels[f't{i}'] = levels[parent] + 1
+    return templates
+
+
+def deepest(templates: dict[str, str]) -> str:
+    return max(templates, key=lambda name: (templates[name].count('/'), name))
+
+
+def measure(func: Callable, number: int, repeat: int) -> float:
+    """Best time of one call in microseconds"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+@benchmark
+def bench_solve(args) -> dict[str, float]:
+    results = {}
+    context = make_context()
+    for count in args.template_counts:
+        templates = make_templates(count)
+        name = deepest(templates)
+        solver = TemplateSolver(templates)
+        results[f'solve[templates={count}]'] = measure(
+            lambda: solver.solve(name, context), args.number, args.repeat)
+        results[f'solve_partial[templates={count}]'] = measure(
+            lambda: solver.solve_partial(name, {'root': context['root']}), args.number, args.repeat)
+        # first solve compiles template
+        results[f'solve_cold[templates={count}]'] = measure(
+            lambda: TemplateSolver(templates).solve(name, context), max(args.number // 10, 1), args.repeat)
+    return results
+
+
+@benchmark
+def bench_context_size(args) -> dict[str, float]:
+    results = {}
+    solver = TemplateSolver(dict(TEMPLATES))
+    for size in args.context_sizes:
+        context = make_context(size)
+        results[f'solve[context={size}]'] = measure(
+            lambda: solver.solve('publish_file', context), args.number, args.repeat)
+    return results
+
+
+@benchmark
+def bench_get_variables(args) -> dict[str, float]:
+    results = {}
+    for count in args.template_counts:
+        templates = make_templates(count)
+        name = deepest(templates)
+        solver = TemplateSolver(templates)
+        results[f'get_variables[templates={count}]'] = measure(
+            lambda: solver.get_variables(name), args.number, args.repeat)
+        results[f'get_variables_cold[templates={count}]'] = measure(
+            lambda: TemplateSolver(templates).get_variables(name), max(args.number // 10, 1), args.repeat)
+        results[f'compile_all[templates={count}]'] = measure(
+            lambda: TemplateSolver(templates).compile_all(), 1, args.repeat) / count
+    return results
+
+
+@benchmark
+def bench_solve_many(args) -> dict[str, float]:
+    solver = TemplateSolver(dict(TEMPLATES))
+    base = make_context()
+    contexts = [{**base, 'frame': 1001 + i} for i in range(args.batch)]
+
+    def loop():
+        return [solver.solve('publish_file', ctx) for ctx in contexts]
+
+    def batch():
+        return solver.solve_many('publish_file', contexts)
+
+    def sequence():
+        return list(solver.solve_sequence('publish_file', base, range(1001, 1001 + args.batch)))
+
+    assert loop() == batch() == sequence()
+    return {
+        f'solve_loop[items={args.batch}]': measure(loop, 1, args.repeat) / args.batch,
+        f'solve_many[items={args.batch}]': measure(batch, 1, args.repeat) / args.batch,
+        f'solve_sequence[items={args.batch}]': measure(sequence, 1, args.repeat) / args.batch,
+    }
+
+
+@benchmark
+def bench_parse(args) -> dict[str, float]:
+    solver = TemplateSolver(dict(TEMPLATES))
+    base = make_context()
+    solver.set_parse_patterns({'root.projects': known_values_pattern([base['root']['projects']])})
+    paths = [solver.solve(name, {**base, 'frame': 1001 + i})
+             for i in range(args.batch // len(TEMPLATES))
+             for name in TEMPLATES]
+
+    def parse():
+        return [solver.parse('publish_file', path) for path in paths]
+
+    def classify():
+        return list(solver.classify(paths))
+
+    return {
+        f'parse[items={len(paths)}]': measure(parse, 1, args.repeat) / len(paths),
+        f'classify[items={len(paths)}]': measure(classify, 1, args.repeat) / len(paths),
+    }
+
+
+def print_results(results: dict[str, float], baseline: dict[str, float] = None):
+    for name, value in results.items():
+        line = f'{name:>45}: {value:10.2f} us'
+        if baseline and name in baseline:
+            line += f'  ({value / baseline[name]:5.2f}x baseline)'
+        print(line)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('benchmarks', nargs='*', help=f'Benchmarks to run (default all): {", ".join(BENCHMARKS)}')
+    parser.add_argument('--number', type=int, default=2000, help='Calls per measurement')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--batch', type=int, default=2000, help='Contexts count for batch benchmarks')
+    parser.add_argument('--template-counts', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--context-sizes', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--save', type=Path, help='Save results to json file')
+    parser.add_argument('--compare', type=Path, help='Compare with baseline json file')
+    parser.add_argument('--threshold', type=float, default=1.5, help='Allowed slowdown against baseline')
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f'Unknown benchmarks: {", ".join(sorted(unknown))}')
+
+    baseline_data = json.loads(args.compare.read_text()) if args.compare else {}
+    baseline = baseline_data.get('results')
+    results = {}
+    for name in args.benchmarks or BENCHMARKS:
+        print(f' {name} '.center(80, '='))
+        bench_results = BENCHMARKS[name](args)
+        print_results(bench_results, baseline)
+        results.update(bench_results)
+
+    if args.save:
+        args.save.write_text(json.dumps({
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': {name: round(value, 3) for name, value in results.items()},
+        }, indent=2) + '\n')
+    if baseline and baseline_data.get('synthetic'):
+        print(f'{args.compare} is a synthetic baseline, slowdowns are not checked')
+    elif baseline:
+        regressions = [name for name, value in results.items()
+                       if name in baseline and value > baseline[name] * args.threshold]
+        if regressions:
+            print(f'Slower than baseline x{args.threshold}: {", ".join(regressions)}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
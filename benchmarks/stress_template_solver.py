@@ -0,0 +1,88 @@
+"""
+Concurrency stress check for the template solver.
+One solver (and one set of tokens) is shared by all threads, every result is compared
+with the result of single-threaded solving, any difference or exception fails the run.
+Also runs by pytest as tests/test_template_solver_threads.py.
+
+Usage:
+    python benchmarks/stress_template_solver.py [--threads 16] [--contexts 5000]
+"""
+import argparse
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from agio_pipe.utils.template_solver import TemplateSolver, TokenOptional, TokenRegular
+
+TEMPLATES = {
+    'root_path': '{root.projects}',
+    'project_root': '<root_path>/{project.name:lower:strip}',
+    'publish_dir': '<project_root>/{entity.name}/(!{entity.variant})/{task.name}/publish/(_{step}_)/v{version:04d}',
+    'publish_file': '<publish_dir>/{entity.name}_v{version:04d}(.{frame:04d}).{ext}',
+}
+
+
+def make_context(index: int) -> dict:
+    rnd = random.Random(index)
+    context = {
+        'root': {'projects': '/mnt/projects'},
+        'project': {'name': f'Project{index % 7} '},
+        'entity': {'name': f'sh{index:04d}', 'variant': rnd.choice(['main', 'alt', 'var'])},
+        'task': {'name': rnd.choice(['anim', 'light', 'comp'])},
+        'version': rnd.randint(1, 300),
+        'ext': rnd.choice(['exr', 'abc', 'usd']),
+    }
+    if index % 2:
+        context['frame'] = 1000 + index
+    if index % 3:
+        context['step'] = 'step'
+    return context
+
+
+def render(solver: TemplateSolver, tokens: list, context: dict) -> tuple:
+    return (
+        solver.solve('publish_file', context),
+        solver.solve_partial('publish_file', context, keep_optional=False),
+        solver.solve_template_string('<publish_dir>/{ext}', context),
+        tuple(token.solve(context) for token in tokens),
+    )
+
+
+def run_stress(threads: int = 16, count: int = 5000, rounds: int = 3) -> None:
+    """
+    Solve contexts in threads sharing one solver, raise AssertionError if any result
+    differs from single-threaded solving. Exceptions of worker threads are re-raised.
+    """
+    contexts = [make_context(i) for i in range(count)]
+    tokens = [TokenOptional('(_{step}_)'), TokenOptional('(.{frame:04d})'), TokenRegular('{entity.name:upper}')]
+    expected = [render(TemplateSolver(dict(TEMPLATES)), [type(t)(t.raw_value) for t in tokens], ctx)
+                for ctx in contexts]
+
+    for round_index in range(rounds):
+        # shared, not compiled yet: first calls compile concurrently
+        solver = TemplateSolver(dict(TEMPLATES))
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(lambda ctx: render(solver, tokens, ctx), contexts))
+            batches = [contexts[i:i + 100] for i in range(0, len(contexts), 100)]
+            batch_results = [path for batch in executor.map(
+                lambda batch: solver.solve_many('publish_file', batch), batches) for path in batch]
+        assert len(results) == len(batch_results) == len(contexts)
+        for index, (result, batch_result, exp) in enumerate(zip(results, batch_results, expected)):
+            assert result == exp, f'round {round_index}, context {index}: {result} != {exp}'
+            assert batch_result == exp[0], f'round {round_index}, context {index}: {batch_result} != {exp[0]}'
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--contexts', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    run_stress(args.threads, args.contexts, args.rounds)
+    print(f'{args.rounds} rounds, {args.threads} threads, {args.contexts} contexts: ok')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
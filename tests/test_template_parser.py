@@ -0,0 +1,35 @@
+from agio_pipe.utils.template_parser import known_values_pattern
+from agio_pipe.utils.template_solver import TemplateSolver
+
+ROOTS = {'root': known_values_pattern(['/mnt/projects', '/mnt'])}
+
+
+def make_solver(templates: dict) -> TemplateSolver:
+    solver = TemplateSolver(templates)
+    solver.set_parse_patterns(ROOTS)
+    return solver
+
+
+def test_empty_optional_group():
+    solver = make_solver({'scene': '{root}/{entity.name}(_{entity.variant})/{entity.name}_v{version:03d}.ma'})
+    assert solver.parse('scene', '/mnt/projects/sh010/sh010_v003.ma') == {
+        'root': '/mnt/projects', 'entity': {'name': 'sh010'}, 'version': 3
+    }
+    assert solver.parse('scene', '/mnt/projects/sh010_a/sh010_v003.ma') == {
+        'root': '/mnt/projects', 'entity': {'name': 'sh010', 'variant': 'a'}, 'version': 3
+    }
+    assert solver.parse('scene', '/mnt/projects/sh010/sh020_v003.ma') is None
+
+
+def test_root_does_not_absorb_path_parts():
+    solver = make_solver({'dir': '{root}/(_{entity.variant}/){entity.name}/v{version:03d}'})
+    assert solver.parse('dir', '/mnt/projects/sh010/v001') == {
+        'root': '/mnt/projects', 'entity': {'name': 'sh010'}, 'version': 1
+    }
+    assert solver.parse('dir', '/mnt/other/sh010/v001') is None
+
+
+def test_repeated_variable_in_optional_group():
+    solver = make_solver({'dir': '{root}/(v_{entity.variant}/){entity.variant}/{version:03d}'})
+    assert solver.parse('dir', '/mnt/a/003') == {'root': '/mnt', 'entity': {'variant': 'a'}, 'version': 3}
+    assert solver.parse('dir', '/mnt/v_a/a/003') == {'root': '/mnt', 'entity': {'variant': 'a'}, 'version': 3}
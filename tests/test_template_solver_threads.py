@@ -0,0 +1,10 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / 'benchmarks'))
+
+from stress_template_solver import run_stress  # noqa: E402
+
+
+def test_shared_solver_in_threads():
+    run_stress(threads=8, count=1000, rounds=2)